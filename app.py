@@ -1,11 +1,13 @@
 import streamlit as st
+import argparse
 import os
-from audio_extractor import download_youtube_audio, extract_audio_from_video
-from audio_chunker import partition_audio_equal, partition_audio_by_timestamps
-from transcription import transcribe_audio
-from summarization import generate_summary
-from youtube_processor import get_video_description, extract_timestamps_from_description
-from utils import save_markdown, clean_filename, get_audio_duration
+import shutil
+import time
+import uuid
+from background_jobs import JobRunner
+from cache import copy_and_hash
+from search_index import search, format_offset, hit_url
+from config import MAX_WORKERS, YOUTUBE_AUDIO_FORMAT, IN_MEMORY_CHUNKS, OPENAI_API_KEY
 
 # Configurações da página
 st.set_page_config(
@@ -15,140 +17,183 @@ st.set_page_config(
 )
 
 # Constantes
-SHORT_DURATION_THRESHOLD = 30 * 60  # 30 minutos
 SUPPORTED_LANGUAGES = ["Português", "English"]
+UPLOAD_DIR = os.path.join("temp_media", "uploads")
+POLL_SECONDS = 2
+STREAM_POLL_SECONDS = 0.1
+UPLOAD_BLOCK_BYTES = 8 * 1024 * 1024
 
 def initialize_session_state():
     if "language" not in st.session_state:
         st.session_state.language = "Português"
-    if "progress" not in st.session_state:
-        st.session_state.progress = 0
-    if "costs" not in st.session_state:
-        st.session_state.costs = {"transcription": 0, "summary": 0}
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = []
 
 def get_text(pt, en):
     return pt if st.session_state.language == "Português" else en
 
-def process_short_audio(audio_path: str, output_prefix: str):
-    """Processa áudios curtos"""
-    with st.status(get_text("Processando arquivo de áudio curto...", "Processing short audio file..."), expanded=True):
-        st.session_state.progress = 25
-        transcript, transcript_cost = transcribe_audio(audio_path)
-        
-        st.session_state.progress = 50
-        summary, summary_cost = generate_summary(transcript)
-        
-        st.session_state.progress = 75
-        save_markdown(f"{output_prefix}_transcript.md", transcript)
-        save_markdown(f"{output_prefix}_summary.md", summary)
-        
-        st.session_state.costs["transcription"] = transcript_cost
-        st.session_state.costs["summary"] = summary_cost
-        st.session_state.progress = 100
-        
-        return transcript, summary
-
-def process_long_audio_equal(audio_path: str, output_prefix: str, num_chunks: int = 4):
-    """Processa áudios longos com particionamento igual"""
-    with st.status(get_text("Processando arquivo de áudio longo...", "Processing long audio file..."), expanded=True):
-        total_transcript_cost = 0.0
-        total_summary_cost = 0.0
-
-        st.write(get_text("Particionando áudio...", "Partitioning audio..."))
-        chunk_files = partition_audio_equal(audio_path, num_chunks)
-        chunk_transcripts = []
-        chunk_summaries = []
-
-        progress_per_chunk = 90 / (num_chunks * 2)  # 90% dividido entre transcrição e resumo de cada chunk
-        
-        for i, chunk in enumerate(chunk_files):
-            st.write(f"{get_text('Transcrevendo parte', 'Transcribing chunk')} {i+1}/{num_chunks}...")
-            transcript, chunk_trans_cost = transcribe_audio(chunk)
-            total_transcript_cost += chunk_trans_cost
-            chunk_transcripts.append(transcript)
-            save_markdown(f"{output_prefix}_chunk_{i}_transcript.md", transcript)
-            st.session_state.progress += progress_per_chunk
-
-            st.write(f"{get_text('Resumindo parte', 'Summarizing chunk')} {i+1}/{num_chunks}...")
-            summary, chunk_sum_cost = generate_summary(transcript)
-            total_summary_cost += chunk_sum_cost
-            chunk_summaries.append(summary)
-            save_markdown(f"{output_prefix}_chunk_{i}_summary.md", summary)
-            st.session_state.progress += progress_per_chunk
-
-            os.remove(chunk)
-
-        st.write(get_text("Finalizando...", "Finalizing..."))
-        merged_transcript = "\n\n".join(chunk_transcripts)
-        merged_summary = "\n\n".join(chunk_summaries)
-        final_summary, final_sum_cost = generate_summary(merged_summary)
-        total_summary_cost += final_sum_cost
-
-        save_markdown(f"{output_prefix}_merged_transcript.md", merged_transcript)
-        save_markdown(f"{output_prefix}_merged_summary.md", merged_summary)
-        save_markdown(f"{output_prefix}_final_summary.md", final_summary)
-
-        st.session_state.costs["transcription"] = total_transcript_cost
-        st.session_state.costs["summary"] = total_summary_cost
-        st.session_state.progress = 100
+@st.cache_resource
+def get_job_runner():
+    # Um único executor por processo, compartilhado por todas as sessões e usuários
+    return JobRunner()
+
+def save_upload(uploaded_file):
+    """Salva o upload em um diretório só dele e retorna (diretório, caminho, chave do job)"""
+    upload_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    os.makedirs(upload_dir, exist_ok=True)
+    temp_path = os.path.join(upload_dir, os.path.basename(uploaded_file.name))
+    # Copiado em blocos de UPLOAD_BLOCK_BYTES e com o hash calculado na mesma passada: nenhuma cópia
+    # extra do vídeo inteiro em memória, e o arquivo salvo não é lido de novo
+    uploaded_file.seek(0)
+    content_hash = copy_and_hash(uploaded_file, temp_path, UPLOAD_BLOCK_BYTES)
+    # A chave usa o conteúdo: o mesmo vídeo enviado de novo retoma o job, e arquivos diferentes
+    # com o mesmo nome nunca dividem um workspace
+    return upload_dir, temp_path, f"upload:{content_hash}"
+
+def build_args(partition_method, max_workers, trim_silence, tempo):
+    """Converte as opções da interface nos argumentos do pipeline (ver main.add_processing_arguments)"""
+    partitions = {
+        get_text("Igual", "Equal"): "equal",
+        get_text("Timestamps (apenas YouTube)", "Timestamps (YouTube only)"): "timestamps",
+        get_text("Capítulos (apenas YouTube)", "Chapters (YouTube only)"): "chapters",
+    }
+    return argparse.Namespace(
+        partition=partitions.get(partition_method),
+        chunks=None,
+        trim_silence=trim_silence,
+        tempo=tempo,
+        youtube_format=YOUTUBE_AUDIO_FORMAT,
+        stream=False,
+        in_memory_chunks=IN_MEMORY_CHUNKS,
+        profile=False,
+        workers=int(max_workers),
+    )
 
-        return merged_transcript, final_summary
+def open_job(job_id):
+    """Mostra o job e guarda o id na URL, para que ele continue visível após recarregar ou reconectar"""
+    st.query_params["job"] = job_id
+    if job_id not in st.session_state.jobs:
+        st.session_state.jobs.append(job_id)
+
+def status_text(status):
+    return {
+        "queued": get_text("Na fila", "Queued"),
+        "running": get_text("Processando", "Processing"),
+        "done": get_text("Concluído", "Done"),
+        "failed": get_text("Falhou", "Failed"),
+        "interrupted": get_text("Interrompido", "Interrupted"),
+    }.get(status, status)
+
+def show_messages(job, expanded):
+    with st.expander(get_text("Mensagens do processamento", "Processing messages"), expanded=expanded):
+        st.code("\n".join(job["messages"]) or "...")
+
+def follow_summary(job_id):
+    """Gera o texto do resumo final conforme o job o recebe do GPT-4o, até o job terminar"""
+    sent = 0
+    while True:
+        job = get_job_runner().get(job_id)
+        text = job.get("summary_so_far") or ""
+        if len(text) > sent:
+            yield text[sent:]
+            sent = len(text)
+        if job["status"] not in ("queued", "running"):
+            return
+        time.sleep(STREAM_POLL_SECONDS)
+
+@st.fragment(run_every=POLL_SECONDS)
+def show_job_progress(job_id):
+    """Atualiza o progresso do job a cada POLL_SECONDS sem bloquear o resto da página"""
+    job = get_job_runner().get(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        # Terminou: recarrega a página inteira para mostrar os resultados
+        st.rerun()
+    st.info(f"{status_text(job['status'])}: {job['input']}")
+    st.progress(job["progress"], text=job["messages"][-1] if job["messages"] else status_text(job["status"]))
+    show_messages(job, expanded=False)
+    # O resumo final aparece enquanto é gerado
+    if job.get("summary_so_far"):
+        st.subheader(get_text("Resumo", "Summary"))
+        st.write_stream(follow_summary(job_id))
+
+def show_job_result(job):
+    """Mostra os resultados de um job concluído, lidos do job.json"""
+    result = job["result"]
+    st.success(get_text("Processamento concluído!", "Processing complete!"))
 
-def process_long_audio_timestamps(audio_path: str, output_prefix: str, description: str):
-    """Processa áudios longos usando timestamps"""
-    timestamps = extract_timestamps_from_description(description)
-    if not timestamps:
-        st.warning(get_text(
-            "Nenhum timestamp encontrado na descrição. Usando particionamento igual.",
-            "No timestamps found in description. Using equal partitioning."
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(get_text("Transcrição", "Transcription"))
+        st.markdown(result["transcript"])
+    with col2:
+        st.subheader(get_text("Resumo", "Summary"))
+        st.markdown(result["summary"])
+
+    # Mostrar custos
+    st.subheader(get_text("Custos Estimados", "Estimated Costs"))
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(get_text("Transcrição", "Transcription"), f"${result['transcript_cost']:.4f}")
+    with col2:
+        st.metric(get_text("Resumo", "Summary"), f"${result['summary_cost']:.4f}")
+    with col3:
+        total = result["transcript_cost"] + result["summary_cost"]
+        st.metric(get_text("Total", "Total"), f"${total:.4f}")
+    # Jobs salvos antes desta contagem não têm o campo "cache"
+    if result.get("cache"):
+        cache_stats = result["cache"]
+        st.caption(get_text(
+            f"Cache: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas",
+            f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
         ))
-        return process_long_audio_equal(audio_path, output_prefix)
-
-    with st.status(get_text(
-        "Processando arquivo de áudio longo com timestamps...",
-        "Processing long audio file with timestamps..."
-    ), expanded=True):
-        total_transcript_cost = 0.0
-        total_summary_cost = 0.0
-
-        chunk_info = partition_audio_by_timestamps(audio_path, timestamps)
-        section_transcripts = []
-        section_summaries = []
-
-        progress_per_section = 90 / (len(chunk_info) * 2)
-
-        for i, (chunk_file, label) in enumerate(chunk_info):
-            st.write(f"{get_text('Transcrevendo seção', 'Transcribing section')} {label}...")
-            transcript, chunk_trans_cost = transcribe_audio(chunk_file)
-            total_transcript_cost += chunk_trans_cost
-            section_transcripts.append(f"## {label}\n\n{transcript}")
-            save_markdown(f"{output_prefix}_{label}_transcript.md", transcript)
-            st.session_state.progress += progress_per_section
-
-            st.write(f"{get_text('Resumindo seção', 'Summarizing section')} {label}...")
-            summary, chunk_sum_cost = generate_summary(transcript)
-            total_summary_cost += chunk_sum_cost
-            section_summaries.append(f"## {label}\n\n{summary}")
-            save_markdown(f"{output_prefix}_{label}_summary.md", summary)
-            st.session_state.progress += progress_per_section
-
-            os.remove(chunk_file)
-
-        st.write(get_text("Finalizando...", "Finalizing..."))
-        merged_transcript = "\n\n".join(section_transcripts)
-        merged_summary = "\n\n".join(section_summaries)
-        final_summary, final_sum_cost = generate_summary(merged_summary)
-        total_summary_cost += final_sum_cost
-
-        save_markdown(f"{output_prefix}_merged_transcript.md", merged_transcript)
-        save_markdown(f"{output_prefix}_merged_summary.md", merged_summary)
-        save_markdown(f"{output_prefix}_final_summary.md", final_summary)
-
-        st.session_state.costs["transcription"] = total_transcript_cost
-        st.session_state.costs["summary"] = total_summary_cost
-        st.session_state.progress = 100
-
-        return merged_transcript, final_summary
+    st.caption(get_text(
+        f"Arquivos salvos em {result['output_prefix']}_*",
+        f"Files saved to {result['output_prefix']}_*"
+    ))
+    with st.expander(get_text("Tempo por etapa", "Time per stage")):
+        st.code(result["profile"])
+    show_messages(job, expanded=False)
+
+def show_job(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        st.warning(get_text("Job não encontrado.", "Job not found."))
+        return
+    if job["status"] in ("queued", "running"):
+        show_job_progress(job_id)
+    elif job["status"] == "done":
+        show_job_result(job)
+    else:
+        st.error(f"{status_text(job['status'])}: {job['error'] or job['input']}")
+        show_messages(job, expanded=True)
+        # O workspace e o manifesto ficam salvos, então o novo job continua de onde este parou
+        if st.button(get_text("Continuar de onde parou", "Resume where it stopped")):
+            open_job(get_job_runner().resubmit(job_id))
+            st.rerun()
+
+def show_search():
+    """Busca no índice de todos os vídeos já processados (ver search_index.py)"""
+    with st.expander(get_text("🔎 Buscar nos vídeos processados", "🔎 Search processed videos")):
+        query = st.text_input(get_text("Palavras:", "Words:"), key="search_query")
+        if not query:
+            return
+        hits = search(query)
+        if not hits:
+            st.info(get_text("Nenhum resultado.", "No results."))
+        kinds = {
+            "transcript": get_text("Transcrição", "Transcript"),
+            "summary": get_text("Resumo da seção", "Section summary"),
+            "final_summary": get_text("Resumo final", "Final summary"),
+            "chapter": get_text("Capítulo", "Chapter"),
+        }
+        for hit in hits:
+            offset = format_offset(hit["start_ms"])
+            # Vídeos do YouTube abrem no ponto do resultado
+            url = hit_url(hit)
+            position = f"[{offset}]({url})" if url else offset
+            label = f" · {hit['label']}" if hit["label"] else ""
+            st.markdown(f"**{hit['title']}** · {position} · {kinds.get(hit['kind'], hit['kind'])}{label}")
+            st.caption(hit["snippet"])
 
 def main():
     initialize_session_state()
@@ -160,6 +205,16 @@ def main():
             SUPPORTED_LANGUAGES,
             index=SUPPORTED_LANGUAGES.index(st.session_state.language)
         )
+        # Jobs desta sessão; os resultados continuam disponíveis enquanto o job.json existir
+        if st.session_state.jobs:
+            st.subheader(get_text("Seus jobs", "Your jobs"))
+            for job_id in reversed(st.session_state.jobs):
+                job = get_job_runner().get(job_id)
+                if job is None:
+                    continue
+                label = f"{status_text(job['status'])} · {os.path.basename(job['input']) or job['input']}"
+                if st.button(label, key=f"job_{job_id}"):
+                    open_job(job_id)
 
     # Título e descrição
     st.title("🎥 AI Video Summarizer")
@@ -167,17 +222,19 @@ def main():
         "Transcreva e resuma vídeos do YouTube ou arquivos locais usando IA",
         "Transcribe and summarize YouTube videos or local files using AI"
     ))
+    show_search()
 
     # Input do usuário
     input_method = st.radio(
         get_text("Escolha o método de entrada:", "Choose input method:"),
-        [get_text("URL do YouTube", "YouTube URL"), 
+        [get_text("URL do YouTube", "YouTube URL"),
          get_text("Arquivo Local", "Local File")]
     )
 
-    input_source = None
+    input_url = None
+    uploaded_file = None
     if input_method == get_text("URL do YouTube", "YouTube URL"):
-        input_source = st.text_input(
+        input_url = st.text_input(
             get_text("Cole a URL do YouTube:", "Paste YouTube URL:"),
             placeholder="https://www.youtube.com/watch?v=..."
         )
@@ -186,13 +243,6 @@ def main():
             get_text("Escolha um arquivo de vídeo:", "Choose a video file:"),
             type=["mp4", "mov", "avi", "mkv"]
         )
-        if uploaded_file:
-            # Salvar o arquivo temporariamente
-            temp_path = os.path.join("temp_media", uploaded_file.name)
-            os.makedirs("temp_media", exist_ok=True)
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            input_source = temp_path
 
     # Opções de processamento
     col1, col2 = st.columns(2)
@@ -201,92 +251,45 @@ def main():
             get_text("Método de particionamento:", "Partitioning method:"),
             [get_text("Automático", "Automatic"),
              get_text("Igual", "Equal"),
-             get_text("Timestamps (apenas YouTube)", "Timestamps (YouTube only)")]
+             get_text("Timestamps (apenas YouTube)", "Timestamps (YouTube only)"),
+             get_text("Capítulos (apenas YouTube)", "Chapters (YouTube only)")]
+        )
+    with col2:
+        max_workers = st.number_input(
+            get_text("Partes processadas em paralelo:", "Chunks processed in parallel:"),
+            min_value=1,
+            max_value=16,
+            value=MAX_WORKERS
+        )
+        trim_silence = st.checkbox(get_text("Remover pausas longas", "Trim long pauses"))
+        tempo = st.slider(
+            get_text("Acelerar áudio:", "Speed up audio:"),
+            min_value=1.0,
+            max_value=2.0,
+            value=1.0,
+            step=0.05
         )
 
-    # Botão de processamento
-    if st.button(get_text("Processar Vídeo", "Process Video"), disabled=not input_source):
-        st.session_state.progress = 0
-        st.session_state.costs = {"transcription": 0, "summary": 0}
-
-        # Criar diretórios necessários
-        os.makedirs("temp_media", exist_ok=True)
-        os.makedirs("transcription_and_summaries", exist_ok=True)
-        audio_file = os.path.join("temp_media", "output.mp3")
-
-        try:
-            # Download/extração do áudio
-            with st.status(get_text("Preparando áudio...", "Preparing audio..."), expanded=True):
-                if input_method == get_text("URL do YouTube", "YouTube URL"):
-                    success, video_title = download_youtube_audio(input_source, audio_file)
-                    if not success:
-                        st.error(get_text(
-                            "Falha ao baixar áudio do YouTube.",
-                            "Failed to download YouTube audio."
-                        ))
-                        return
-                    description = get_video_description(input_source)
-                    base_name = clean_filename(video_title)
-                else:
-                    if not extract_audio_from_video(input_source, audio_file):
-                        st.error(get_text(
-                            "Falha ao extrair áudio do vídeo.",
-                            "Failed to extract audio from video."
-                        ))
-                        return
-                    description = ""
-                    base_name = clean_filename(os.path.splitext(os.path.basename(input_source))[0])
-
-            output_prefix = os.path.join("transcription_and_summaries", base_name)
-            
-            # Verificar duração e processar
-            duration = get_audio_duration(audio_file)
-            st.write(f"{get_text('Duração do áudio:', 'Audio duration:')} {duration/60:.1f} min")
-
-            if duration <= SHORT_DURATION_THRESHOLD or partition_method == get_text("Automático", "Automatic"):
-                transcript, summary = process_short_audio(audio_file, output_prefix)
-            else:
-                if (partition_method == get_text("Timestamps (apenas YouTube)", "Timestamps (YouTube only)") 
-                    and input_method == get_text("URL do YouTube", "YouTube URL")):
-                    transcript, summary = process_long_audio_timestamps(audio_file, output_prefix, description)
-                else:
-                    transcript, summary = process_long_audio_equal(audio_file, output_prefix)
-
-            # Mostrar resultados
-            st.success(get_text("Processamento concluído!", "Processing complete!"))
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.subheader(get_text("Transcrição", "Transcription"))
-                st.markdown(transcript)
-            with col2:
-                st.subheader(get_text("Resumo", "Summary"))
-                st.markdown(summary)
-
-            # Mostrar custos
-            st.subheader(get_text("Custos Estimados", "Estimated Costs"))
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric(get_text("Transcrição", "Transcription"), 
-                         f"${st.session_state.costs['transcription']:.4f}")
-            with col2:
-                st.metric(get_text("Resumo", "Summary"),
-                         f"${st.session_state.costs['summary']:.4f}")
-            with col3:
-                total = st.session_state.costs['transcription'] + st.session_state.costs['summary']
-                st.metric(get_text("Total", "Total"), f"${total:.4f}")
-
-        finally:
-            # Limpar arquivos temporários
-            if os.path.exists(audio_file):
-                os.remove(audio_file)
-            if input_method != get_text("URL do YouTube", "YouTube URL") and input_source:
-                if os.path.exists(input_source):
-                    os.remove(input_source)
-
-    # Mostrar barra de progresso se estiver processando
-    if st.session_state.progress > 0:
-        st.progress(st.session_state.progress / 100)
+    # Botão de processamento: o job roda em segundo plano e a página só acompanha o progresso
+    if not OPENAI_API_KEY:
+        st.error(get_text("Defina OPENAI_API_KEY no arquivo .env para processar vídeos.", "Set OPENAI_API_KEY in your .env file to process videos."))
+    elif st.button(get_text("Processar Vídeo", "Process Video"), disabled=not (input_url or uploaded_file)):
+        args = build_args(partition_method, max_workers, trim_silence, tempo)
+        if uploaded_file:
+            upload_dir, input_source, job_key = save_upload(uploaded_file)
+            # O upload é apagado quando o job termina com sucesso
+            job_id = get_job_runner().submit(input_source, args, job_key, cleanup_paths=(upload_dir,))
+            if upload_dir not in get_job_runner().get(job_id)["cleanup_paths"]:
+                # O mesmo arquivo já está sendo processado por outro job; esta cópia não é usada
+                shutil.rmtree(upload_dir, ignore_errors=True)
+        else:
+            job_id = get_job_runner().submit(input_url, args)
+        open_job(job_id)
+
+    job_id = st.query_params.get("job")
+    if job_id:
+        st.divider()
+        show_job(job_id)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
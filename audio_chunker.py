@@ -1,56 +1,379 @@
-import ffmpeg
+import bisect
+import glob
+import io
 import math
 import os
+import re
+import media_info
+from instrumentation import stage, file_size
+from config import WHISPER_MAX_UPLOAD_BYTES, UPLOAD_SAFETY_MARGIN, SILENCE_SNAP_TOLERANCE, IN_MEMORY_CHUNKS
 from utils import get_audio_duration
+from worker_pools import ffmpeg_slot
+from lazy_imports import lazy_import
 
-def partition_audio_equal(audio_path: str, num_chunks: int) -> list:
+ffmpeg = lazy_import("ffmpeg")
+
+# Chunks that have to be re-encoded are uploaded as 16kHz mono MP3
+CHUNK_SAMPLE_RATE = 16000
+CHUNK_CHANNELS = 1
+CHUNK_BITRATE = '96k'
+CHUNK_BITRATE_BPS = 96000
+
+# What counts as a pause when looking for cut points
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_DURATION = 0.3
+
+def job_work_dir(audio_path: str) -> str:
     """
-    Partitions the audio file into num_chunks equal parts.
-    Returns a list of chunk file names.
+    Returns the directory chunks of audio_path are written to: the directory of the audio itself,
+    so every job keeps its files in its own workspace.
+    """
+    work_dir = os.path.dirname(os.path.abspath(audio_path))
+    os.makedirs(work_dir, exist_ok=True)
+    return work_dir
+
+def plan_equal_cuts(total_duration: float, num_chunks: int) -> list:
+    """
+    Splits total_duration into num_chunks equal parts.
+    Returns a list of tuples (start_in_seconds, duration_in_seconds).
     """
-    os.makedirs("temp_media", exist_ok=True)
-    total_duration = get_audio_duration(audio_path)
-    if total_duration == 0:
-        return []
     chunk_duration = total_duration / num_chunks
-    chunks = []
+    plan = []
     for i in range(num_chunks):
         start = i * chunk_duration
         # For the last chunk, ensure we cover the remaining audio
         duration = chunk_duration if (i != num_chunks - 1) else (total_duration - start)
-        chunk_filename = os.path.join("temp_media", f"chunk_equal_{i}.mp3")
+        plan.append((start, duration))
+    return plan
+
+def get_audio_bitrate(audio_path: str) -> float:
+    """
+    Returns the encoded bitrate of the audio file in bits per second (0.0 if unknown).
+    """
+    return media_info.get_bitrate(audio_path)
+
+def fits_in_single_upload(audio_path: str, max_upload_bytes: int = WHISPER_MAX_UPLOAD_BYTES) -> bool:
+    """
+    Returns True if the audio file can be sent to Whisper as is.
+    """
+    return os.path.getsize(audio_path) <= max_upload_bytes * UPLOAD_SAFETY_MARGIN
+
+def plan_chunk_count(duration: float, bitrate: float, max_upload_bytes: int = WHISPER_MAX_UPLOAD_BYTES, snap_tolerance: float = 0.0) -> int:
+    """
+    Returns the fewest chunks of `duration` seconds of audio encoded at `bitrate` bits per second
+    that keep every chunk under the upload limit.
+    `snap_tolerance` reserves room for each of a chunk's two cuts moving that many seconds outwards.
+    """
+    if duration <= 0:
+        return 0
+    max_chunk_seconds = (max_upload_bytes * UPLOAD_SAFETY_MARGIN * 8 / bitrate) - 2 * snap_tolerance
+    if max_chunk_seconds <= 0:
+        raise ValueError("Silence snap tolerance is too large for the upload limit.")
+    return max(1, math.ceil(duration / max_chunk_seconds))
+
+def detect_silences(audio_path: str, noise_db: float = SILENCE_NOISE_DB, min_duration: float = SILENCE_MIN_DURATION) -> list:
+    """
+    Finds the pauses in the audio file with a single ffmpeg silencedetect analysis pass.
+    Returns a list of tuples (silence_start, silence_end) in seconds.
+    """
+    with stage("silence_detect", item=audio_path) as event:
         try:
-            (
-                ffmpeg.input(audio_path, ss=start, t=duration)
-                .output(chunk_filename, ar='16000', ac=1, format='mp3', **{'audio_bitrate': '96k'}, loglevel='error')
-                .run()
-            )
-            chunks.append(chunk_filename)
+            with ffmpeg_slot():
+                _, stderr = (
+                    ffmpeg.input(audio_path)
+                    .audio.filter('silencedetect', noise=f'{noise_db}dB', d=min_duration)
+                    .output('-', format='null')
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
         except ffmpeg.Error as e:
-            print(f"Error creating chunk {i}: {e}")
+            print(f"Error detecting silences: {e}")
+            event["error"] = str(e)
+            return []
+    silences = []
+    start = None
+    for line in stderr.decode('utf-8', errors='replace').splitlines():
+        match = re.search(r'silence_start: (-?[\d.]+)', line)
+        if match:
+            start = max(float(match.group(1)), 0.0)
+            continue
+        match = re.search(r'silence_end: ([\d.]+)', line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+def snap_cuts_to_silence(plan: list, silences: list, tolerance: float = SILENCE_SNAP_TOLERANCE) -> list:
+    """
+    Moves every cut between two chunks of `plan` (list of (start, duration) tuples) to the middle of
+    the nearest pause within `tolerance` seconds, so chunks don't end mid-word.
+    Cuts with no pause nearby are kept. A cut never moves past the cut before it or the next planned cut,
+    so the chunks stay in order even when they are shorter than `tolerance`. Returns a new contiguous plan.
+    """
+    if len(plan) < 2 or not silences or tolerance <= 0:
+        return plan
+    midpoints = [(start + end) / 2 for start, end in silences]
+    plan_start = plan[0][0]
+    plan_end = plan[-1][0] + plan[-1][1]
+    planned = [start for start, _ in plan[1:]] + [plan_end]
+    cuts = []
+    previous = plan_start
+    for k, start in enumerate(planned[:-1]):
+        i = bisect.bisect_left(midpoints, start)
+        candidates = [midpoints[j] for j in (i - 1, i) if 0 <= j < len(midpoints)]
+        best = min(candidates, key=lambda m: abs(m - start))
+        cut = best if abs(best - start) <= tolerance and previous < best < planned[k + 1] else start
+        cuts.append(cut)
+        previous = cut
+    bounds = [plan_start] + cuts + [plan_end]
+    snapped = [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(len(plan))]
+    if any(duration <= 0 for _, duration in snapped):
+        print("Warning: snapping the cuts to pauses gave an empty chunk. Using the planned cuts.")
+        return plan
+    return snapped
+
+def plan_audio_cuts(audio_path: str, total_duration: float, num_chunks: int = None, snap_tolerance: float = SILENCE_SNAP_TOLERANCE, max_upload_bytes: int = WHISPER_MAX_UPLOAD_BYTES) -> list:
+    """
+    Plans the chunks of the audio file: the fewest that fit the upload limit (or num_chunks if that is larger),
+    with the cuts moved to nearby pauses when snap_tolerance is set.
+    Returns a list of tuples (start_in_seconds, duration_in_seconds).
+    """
+    bitrate = chunk_bitrate(audio_path)
+    num_chunks = max(num_chunks or 0, plan_chunk_count(total_duration, bitrate, max_upload_bytes, snap_tolerance))
+    plan = plan_equal_cuts(total_duration, num_chunks)
+    if snap_tolerance > 0 and num_chunks > 1:
+        plan = snap_cuts_to_silence(plan, detect_silences(audio_path), snap_tolerance)
+    return plan
+
+def chunk_encoding(audio_path: str) -> tuple[str, dict]:
+    """
+    Decides how chunks are cut from this file. Returns (container_format, ffmpeg output args):
+    streams are copied when the source is already a 16kHz mono MP3 or a compact Opus stream,
+    otherwise chunks are re-encoded to 16kHz mono MP3.
+    """
+    reencode = ('mp3', {'ar': str(CHUNK_SAMPLE_RATE), 'ac': CHUNK_CHANNELS, 'audio_bitrate': CHUNK_BITRATE})
+    try:
+        probe = media_info.probe(audio_path)
+    except (ffmpeg.Error, OSError):
+        return reencode
+    audio_streams = [s for s in probe.get('streams', []) if s.get('codec_type') == 'audio']
+    if len(audio_streams) != 1:
+        return reencode
+    stream = audio_streams[0]
+    if (
+        stream.get('codec_name') == 'mp3'
+        and int(stream.get('sample_rate', 0)) == CHUNK_SAMPLE_RATE
+        and int(stream.get('channels', 0)) == CHUNK_CHANNELS
+    ):
+        return ('mp3', {'acodec': 'copy'})
+    if stream.get('codec_name') == 'opus':
+        # Opus from YouTube (webm) or our own compact ingest (ogg) is already smaller than the MP3 chunks
+        return ('ogg', {'acodec': 'copy'})
+    return reencode
+
+def chunk_bitrate(audio_path: str) -> float:
+    """
+    Returns the bitrate the chunks of this file will have: the source bitrate when its stream
+    is copied, otherwise the chunk encoding bitrate.
+    """
+    if chunk_encoding(audio_path)[1].get('acodec') == 'copy':
+        return get_audio_bitrate(audio_path) or CHUNK_BITRATE_BPS
+    return CHUNK_BITRATE_BPS
+
+def chunk_extension(audio_path: str) -> str:
+    """
+    Returns the file extension of the chunks cut from this file ("mp3" or "ogg").
+    """
+    return chunk_encoding(audio_path)[0]
+
+def cut_chunk(audio_path: str, start: float, duration: float, chunk_filename: str) -> bool:
+    """
+    Cuts a single chunk with its own ffmpeg run.
+    """
+    chunk_format, codec_args = chunk_encoding(audio_path)
+    with stage("cut_chunk", item=os.path.basename(chunk_filename), copy=codec_args.get('acodec') == 'copy') as event:
+        try:
+            with ffmpeg_slot():
+                (
+                    ffmpeg.input(audio_path, ss=start, t=duration)
+                    .output(chunk_filename, format=chunk_format, vn=None, loglevel='error', **codec_args)
+                    .run()
+                )
+        except ffmpeg.Error as e:
+            print(f"Error creating chunk {chunk_filename}: {e}")
+            event["error"] = str(e)
+            return False
+        event["bytes"] = file_size(chunk_filename)
+        event["audio_seconds"] = duration
+        media_info.record_duration(chunk_filename, duration)
+        return True
+
+def memory_chunks(audio_path: str, plan: list) -> list:
+    """
+    Describes the chunks of `plan` (list of (start, duration) tuples) without cutting anything: each one
+    is a dict with the source "audio", "start", "duration" and the chunk encoding, cut by read_chunk
+    when it is needed. The dicts are plain JSON, so a job manifest can record them.
+    """
+    chunk_format, codec_args = chunk_encoding(audio_path)
+    return [
+        {"audio": audio_path, "start": start, "duration": duration, "format": chunk_format, "codec_args": codec_args}
+        for start, duration in plan
+    ]
+
+def is_memory_chunk(chunk) -> bool:
+    return isinstance(chunk, dict)
+
+def release_chunk(chunk):
+    """
+    Deletes a chunk file once it is transcribed; memory chunks have nothing to delete.
+    """
+    if not is_memory_chunk(chunk) and os.path.exists(chunk):
+        os.remove(chunk)
+
+def read_chunk(chunk: dict) -> io.BytesIO:
+    """
+    Cuts a memory chunk with ffmpeg straight into memory (its stdout), without a temporary file.
+    Returns a buffer named after the chunk, ready to upload.
+    """
+    start, duration = chunk["start"], chunk["duration"]
+    name = f"chunk_{start:.0f}.{chunk['format']}"
+    with stage("cut_chunk", item=name, copy=chunk["codec_args"].get('acodec') == 'copy', in_memory=True) as event:
+        try:
+            with ffmpeg_slot():
+                data, _ = (
+                    ffmpeg.input(chunk["audio"], ss=start, t=duration)
+                    .output('pipe:', format=chunk["format"], vn=None, loglevel='error', **chunk["codec_args"])
+                    .run(capture_stdout=True)
+                )
+        except ffmpeg.Error as e:
+            print(f"Error creating chunk {name}: {e}")
+            raise RuntimeError(f"Could not cut the chunk at {start:.1f}s") from e
+        event["bytes"] = len(data)
+        event["audio_seconds"] = duration
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+def split_audio_single_pass(audio_path: str, plan: list, chunk_filenames: list) -> list:
+    """
+    Cuts every chunk in `plan` (list of (start, duration) tuples, contiguous and in order)
+    with a single ffmpeg run using the segment muxer.
+    Streams are copied when chunk_encoding allows it, otherwise they are re-encoded once for all chunks.
+    Returns the list of chunk filenames that were created, in plan order.
+    """
+    if not plan:
+        return []
+    first_start = plan[0][0]
+    last_start, last_duration = plan[-1]
+    # Cut points are relative to the first chunk's start, since the input is seeked there
+    cut_points = [start - first_start for start, _ in plan[1:]]
+    chunk_format, codec_args = chunk_encoding(audio_path)
+    segment_dir = os.path.dirname(chunk_filenames[0]) or "."
+    segment_pattern = os.path.join(segment_dir, f"segment_{os.getpid()}_%04d.{chunk_format}")
+
+    segment_args = {'f': 'segment', 'segment_format': chunk_format, 'reset_timestamps': 1}
+    if cut_points:
+        segment_args['segment_times'] = ",".join(f"{t:.3f}" for t in cut_points)
+    else:
+        # A single chunk: make sure the segment muxer never splits it
+        segment_args['segment_time'] = f"{last_duration + 1:.3f}"
+    with stage("split_audio", item=audio_path, chunks=len(plan), copy=codec_args.get('acodec') == 'copy') as event:
+        try:
+            with ffmpeg_slot():
+                (
+                    ffmpeg.input(audio_path, ss=first_start, t=last_start + last_duration - first_start)
+                    .output(segment_pattern, vn=None, loglevel='error', **segment_args, **codec_args)
+                    .run()
+                )
+        except ffmpeg.Error as e:
+            print(f"Error splitting audio: {e}")
+            event["error"] = str(e)
+            for leftover in glob.glob(segment_pattern.replace("%04d", "*")):
+                os.remove(leftover)
+            return []
+        event["bytes"] = sum(file_size(segment_pattern % i) for i in range(len(plan)))
+        event["audio_seconds"] = last_start + last_duration - first_start
+
+    chunks = []
+    for i, chunk_filename in enumerate(chunk_filenames):
+        segment_file = segment_pattern % i
+        if os.path.exists(segment_file):
+            os.replace(segment_file, chunk_filename)
+            # The duration comes from the cut plan, so transcription doesn't probe the chunk again
+            media_info.record_duration(chunk_filename, plan[i][1])
+            chunks.append(chunk_filename)
+        else:
+            print(f"Error creating chunk {chunk_filename}: segment {i} was not produced")
+    return chunks
+
+def _can_split_single_pass(plan: list) -> bool:
+    # The segment muxer needs strictly increasing, contiguous cut points
+    for (start, duration), (next_start, _) in zip(plan, plan[1:]):
+        if duration <= 0 or not math.isclose(start + duration, next_start, abs_tol=1e-3):
+            return False
+    return bool(plan) and plan[-1][1] > 0
+
+def partition_audio_equal(audio_path: str, num_chunks: int = None, single_pass: bool = True, max_upload_bytes: int = WHISPER_MAX_UPLOAD_BYTES, snap_tolerance: float = SILENCE_SNAP_TOLERANCE, in_memory: bool = IN_MEMORY_CHUNKS) -> list:
+    """
+    Partitions the audio file into (nearly) equal parts.
+    The number of parts is the fewest that fit the upload limit, or num_chunks if that is larger.
+    Cuts are moved to the nearest pause within snap_tolerance seconds.
+    With single_pass (default), every chunk is cut by one ffmpeg run instead of one run per chunk.
+    Chunks are written next to audio_path, in the job's workspace; with in_memory, nothing is written
+    and memory chunks (see memory_chunks) are returned instead.
+    Returns a list of chunk file names.
+    """
+    work_dir = job_work_dir(audio_path)
+    total_duration = get_audio_duration(audio_path)
+    if total_duration == 0:
+        return []
+    plan = plan_audio_cuts(audio_path, total_duration, num_chunks, snap_tolerance, max_upload_bytes)
+    if in_memory:
+        return memory_chunks(audio_path, plan)
+    extension = chunk_extension(audio_path)
+    chunk_filenames = [os.path.join(work_dir, f"chunk_equal_{i}.{extension}") for i in range(len(plan))]
+    if single_pass and _can_split_single_pass(plan):
+        return split_audio_single_pass(audio_path, plan, chunk_filenames)
+    chunks = []
+    for (start, duration), chunk_filename in zip(plan, chunk_filenames):
+        if cut_chunk(audio_path, start, duration, chunk_filename):
+            chunks.append(chunk_filename)
     return chunks
 
-def partition_audio_by_timestamps(audio_path: str, timestamps: list) -> list:
+def partition_audio_by_timestamps(audio_path: str, timestamps: list, single_pass: bool = True, max_upload_bytes: int = WHISPER_MAX_UPLOAD_BYTES, in_memory: bool = IN_MEMORY_CHUNKS) -> list:
     """
     Partitions the audio file based on provided timestamps.
     `timestamps` should be a list of tuples (start_time_in_seconds, label).
+    Sections too large for one upload are split into equal parts labeled "{label}_part{n}".
+    With single_pass (default), every chunk is cut by one ffmpeg run instead of one run per chunk.
+    Chunks are written next to audio_path, in the job's workspace; with in_memory, nothing is written
+    and memory chunks (see memory_chunks) take the place of the file names.
     Returns a list of tuples (chunk_filename, label).
     """
-    os.makedirs("temp_media", exist_ok=True)
+    work_dir = job_work_dir(audio_path)
     total_duration = get_audio_duration(audio_path)
-    chunks = []
+    bitrate = chunk_bitrate(audio_path)
+    extension = chunk_extension(audio_path)
+    plan = []
+    chunk_filenames = []
+    labels = []
     for i, (start, label) in enumerate(timestamps):
         # Determine the end time: next timestamp or total duration
         end = timestamps[i+1][0] if i+1 < len(timestamps) else total_duration
-        duration = end - start
-        chunk_filename = os.path.join("temp_media", f"chunk_{i}_{label}.mp3")
-        try:
-            (
-                ffmpeg.input(audio_path, ss=start, t=duration)
-                .output(chunk_filename, ar='16000', ac=1, format='mp3', **{'audio_bitrate': '96k'}, loglevel='error')
-                .run()
-            )
+        num_parts = max(plan_chunk_count(end - start, bitrate, max_upload_bytes), 1)
+        for j, (part_start, part_duration) in enumerate(plan_equal_cuts(end - start, num_parts)):
+            part_label = label if num_parts == 1 else f"{label}_part{j + 1}"
+            plan.append((start + part_start, part_duration))
+            chunk_filenames.append(os.path.join(work_dir, f"chunk_{len(plan) - 1}_{part_label}.{extension}"))
+            labels.append(part_label)
+
+    if in_memory:
+        return list(zip(memory_chunks(audio_path, plan), labels))
+    if single_pass and _can_split_single_pass(plan):
+        created = set(split_audio_single_pass(audio_path, plan, chunk_filenames))
+        return [(f, label) for f, label in zip(chunk_filenames, labels) if f in created]
+
+    chunks = []
+    for (start, duration), chunk_filename, label in zip(plan, chunk_filenames, labels):
+        if cut_chunk(audio_path, start, duration, chunk_filename):
             chunks.append((chunk_filename, label))
-        except ffmpeg.Error as e:
-            print(f"Error creating chunk for {label}: {e}")
     return chunks
@@ -1,48 +1,256 @@
-import ffmpeg
-import yt_dlp
+import bisect
+import glob
 import os
-from utils import clean_filename
+from audio_chunker import detect_silences
+from instrumentation import stage, file_size
+from config import SILENCE_TRIM_MIN_DURATION, SILENCE_TRIM_KEEP, YOUTUBE_AUDIO_FORMAT
+from utils import clean_filename, get_audio_duration
+from worker_pools import download_slot, ffmpeg_slot
+from youtube_processor import extract_video_metadata
+from lazy_imports import lazy_import
 
-def download_youtube_audio(url: str, output_filename: str = "temp_media/output.mp3") -> tuple[bool, str]:
+ffmpeg = lazy_import("ffmpeg")
+yt_dlp = lazy_import("yt_dlp")
+
+# Upload formats accepted by the Whisper API
+WHISPER_SUPPORTED_EXTENSIONS = {"flac", "m4a", "mp3", "mp4", "mpeg", "mpga", "oga", "ogg", "wav", "webm"}
+
+def _youtube_format_options(audio_format: str) -> dict:
+    if audio_format == "native":
+        # Whisper accepts both YouTube audio containers, so no postprocessing is needed
+        return {'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio'}
+    if audio_format == "opus":
+        # Transcoded by transcode_to_opus, not by yt-dlp: bestaudio is usually Opus already, and
+        # FFmpegExtractAudio would then stream-copy it, keeping its bitrate, rate and channels
+        return {'format': 'bestaudio/best'}
+    if audio_format == "mp3":
+        return {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '96',
+            }],
+        }
+    raise ValueError(f"Unknown YouTube audio format: {audio_format}")
+
+def download_youtube_audio(url: str, output_filename: str = "temp_media/output.mp3", audio_format: str = YOUTUBE_AUDIO_FORMAT) -> tuple[bool, dict, str]:
     """
-    Downloads audio from a YouTube URL and saves as a MP3 file.
-    Returns (success: bool, cleaned_title: str).
+    Downloads audio from a YouTube URL. The extension of output_filename is replaced by the real one.
+    `audio_format` is "native" (keep the published m4a/webm stream, no transcode), "opus" (one
+    transcode to compact 16kHz mono Opus in an .ogg file) or "mp3" (one transcode to 96 kbps MP3).
+    The video's metadata comes from the same info extraction as the download.
+    Returns (success: bool, metadata: dict, audio_path: str); see extract_video_metadata for the metadata keys.
     """
-    os.makedirs("temp_media", exist_ok=True)
+    os.makedirs(os.path.dirname(output_filename) or ".", exist_ok=True)
+    base_path = os.path.splitext(output_filename)[0]
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': output_filename.replace('.mp3', ''),
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '96',
-        }],
+        'outtmpl': base_path + '.%(ext)s',
         'quiet': True,
+        **_youtube_format_options(audio_format),
     }
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            title = info.get('title', 'output')
-            return (True, title)
-    except Exception as e:
-        print(f"Error downloading YouTube audio: {e}")
-        return (False, "")
+    with stage("download", item=url, audio_format=audio_format) as event:
+        try:
+            with download_slot(), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+        except Exception as e:
+            print(f"Error downloading YouTube audio: {e}")
+            event["error"] = str(e)
+            return (False, {}, "")
+
+        downloads = info.get('requested_downloads') or []
+        audio_path = downloads[0].get('filepath') if downloads else None
+        if not audio_path or not os.path.exists(audio_path):
+            candidates = glob.glob(glob.escape(base_path) + '.*')
+            if not candidates:
+                print("Error downloading YouTube audio: downloaded file not found")
+                event["error"] = "downloaded file not found"
+                return (False, {}, "")
+            audio_path = candidates[0]
+        event["bytes"] = file_size(audio_path)
+        event["audio_seconds"] = float(info.get("duration") or 0.0)
+
+    extension = os.path.splitext(audio_path)[1].lstrip('.').lower()
+    if audio_format == "opus":
+        ogg_path = base_path + '.ogg'
+        transcoded_path = base_path + '.transcoded.ogg'
+        if not transcode_to_opus(audio_path, transcoded_path):
+            return (False, {}, "")
+        os.remove(audio_path)
+        os.replace(transcoded_path, ogg_path)
+        audio_path = ogg_path
+    elif extension == 'opus':
+        # Same Ogg/Opus file, under an extension the Whisper API accepts
+        ogg_path = base_path + '.ogg'
+        os.replace(audio_path, ogg_path)
+        audio_path = ogg_path
+    elif extension not in WHISPER_SUPPORTED_EXTENSIONS:
+        mp3_path = base_path + '.mp3'
+        if not extract_audio_from_video(audio_path, mp3_path):
+            return (False, {}, "")
+        os.remove(audio_path)
+        audio_path = mp3_path
+    return (True, extract_video_metadata(info), audio_path)
 
 def extract_audio_from_video(video_path: str, output_filename: str = "temp_media/output.mp3") -> bool:
     """
     Extracts audio from a local video file and saves as MP3 (16kHz, mono).
     """
-    os.makedirs("temp_media", exist_ok=True)
-    try:
-        ffmpeg.input(video_path).output(
-            output_filename,
-            ar='16000',
-            ac=1,
-            **{'ab': '96k'},
-            format='mp3',
-            loglevel='error'
-        ).run()
+    os.makedirs(os.path.dirname(output_filename) or ".", exist_ok=True)
+    with stage("extract_audio", item=video_path, input_bytes=file_size(video_path)) as event:
+        try:
+            with ffmpeg_slot():
+                ffmpeg.input(video_path).output(
+                    output_filename,
+                    ar='16000',
+                    ac=1,
+                    **{'ab': '96k'},
+                    format='mp3',
+                    loglevel='error'
+                ).run()
+        except ffmpeg.Error as e:
+            print(f"Error extracting audio: {e}")
+            event["error"] = str(e)
+            return False
+        event["bytes"] = file_size(output_filename)
         return True
-    except ffmpeg.Error as e:
-        print(f"Error extracting audio: {e}")
-        return False
+
+def transcode_to_opus(audio_path: str, output_filename: str) -> bool:
+    """
+    Transcodes audio to compact 16kHz mono 24 kbps Opus in an Ogg file, always re-encoding.
+    """
+    with stage("transcode_audio", item=audio_path, input_bytes=file_size(audio_path)) as event:
+        try:
+            with ffmpeg_slot():
+                ffmpeg.input(audio_path).output(
+                    output_filename,
+                    acodec='libopus',
+                    ar='16000',
+                    ac=1,
+                    **{'b:a': '24k', 'application': 'voip'},
+                    format='ogg',
+                    loglevel='error'
+                ).run()
+        except ffmpeg.Error as e:
+            print(f"Error transcoding audio: {e}")
+            event["error"] = str(e)
+            return False
+        event["bytes"] = file_size(output_filename)
+        return True
+
+def _atempo_chain(tempo: float) -> list:
+    # atempo only accepts factors between 0.5 and 2.0, so larger changes are chained
+    factors = []
+    while tempo > 2.0:
+        factors.append(2.0)
+        tempo /= 2.0
+    while tempo < 0.5:
+        factors.append(0.5)
+        tempo /= 0.5
+    factors.append(tempo)
+    return [f"atempo={factor:.6f}" for factor in factors if abs(factor - 1.0) > 1e-6]
+
+def compress_audio(audio_path: str, output_filename: str, tempo: float = 1.0, trim_silence: bool = True, min_silence: float = SILENCE_TRIM_MIN_DURATION, keep_silence: float = SILENCE_TRIM_KEEP) -> tuple[bool, dict]:
+    """
+    Shortens every pause longer than min_silence to keep_silence seconds (if trim_silence) and speeds
+    the audio up by `tempo`, in a single ffmpeg encoding pass (after one silence analysis pass).
+    This reduces the billed Whisper minutes and the upload size.
+    Returns (success, time_map); the time map converts times in the compressed audio back to the
+    original timeline (see to_original_time).
+    """
+    if not tempo > 0:
+        raise ValueError(f"tempo must be positive (got {tempo})")
+    total_duration = get_audio_duration(audio_path)
+    if total_duration == 0:
+        return (False, {})
+    kept = []
+    position = 0.0
+    silences = detect_silences(audio_path, min_duration=min_silence) if trim_silence else []
+    for start, end in silences:
+        cut_start = start + keep_silence / 2
+        cut_end = end - keep_silence / 2
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            kept.append((position, cut_start))
+        position = max(position, cut_end)
+    if position < total_duration:
+        kept.append((position, total_duration))
+    time_map = build_time_map(kept, tempo)
+
+    filters = _atempo_chain(tempo)
+    output_args = {'af': ",".join(filters)} if filters else {}
+    source = ffmpeg.input(audio_path)
+    ranges_path = None
+    if len(kept) > 1 or (kept and (kept[0][0] > 0 or kept[0][1] < total_duration)):
+        # The kept ranges are read one after the other by the concat demuxer, from a list file: the work per
+        # frame and the command line don't grow with the number of pauses, as they would with an aselect expression
+        ranges_path = f"{output_filename}.ranges.txt"
+        write_concat_ranges(ranges_path, audio_path, kept)
+        source = ffmpeg.input(ranges_path, format='concat', safe=0)
+    with stage("compress_audio", item=audio_path, input_audio_seconds=total_duration, ranges=len(kept)) as event:
+        try:
+            with ffmpeg_slot():
+                source.output(
+                    output_filename,
+                    ar='16000',
+                    ac=1,
+                    **{'ab': '96k'},
+                    format='mp3',
+                    loglevel='error',
+                    **output_args
+                ).run()
+        except ffmpeg.Error as e:
+            print(f"Error compressing audio: {e}")
+            event["error"] = str(e)
+            return (False, {})
+        finally:
+            if ranges_path and os.path.exists(ranges_path):
+                os.remove(ranges_path)
+        event["bytes"] = file_size(output_filename)
+        event["audio_seconds"] = sum(end - start for start, end in kept) / tempo
+        return (True, time_map)
+
+def write_concat_ranges(path: str, audio_path: str, ranges: list):
+    """
+    Writes an ffmpeg concat demuxer list that plays the (start, end) ranges of audio_path one after the other.
+    """
+    quoted = os.path.abspath(audio_path).replace("'", "'\\''")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for start, end in ranges:
+            f.write(f"file '{quoted}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n")
+
+def build_time_map(kept: list, tempo: float = 1.0) -> dict:
+    """
+    Builds the time map of audio made of the `kept` (start, end) ranges of the original, played at `tempo`.
+    """
+    segments = []
+    processed = 0.0
+    for start, end in kept:
+        segments.append([processed, start, end])
+        processed += (end - start) / tempo
+    return {"tempo": tempo, "segments": segments}
+
+def to_original_time(t: float, time_map: dict) -> float:
+    """
+    Maps a time in the compressed audio to the original timeline. An empty time map is the identity.
+    """
+    segments = time_map.get("segments") if time_map else None
+    if not segments:
+        return t
+    i = max(bisect.bisect_right([s[0] for s in segments], t) - 1, 0)
+    processed_start, original_start, original_end = segments[i]
+    return min(original_start + (t - processed_start) * time_map["tempo"], original_end)
+
+def to_processed_time(t: float, time_map: dict) -> float:
+    """
+    Maps a time in the original timeline to the compressed audio; times inside a removed pause map to
+    the point where the pause was cut. An empty time map is the identity.
+    """
+    segments = time_map.get("segments") if time_map else None
+    if not segments:
+        return t
+    i = max(bisect.bisect_right([s[1] for s in segments], t) - 1, 0)
+    processed_start, original_start, original_end = segments[i]
+    return processed_start + (min(max(t, original_start), original_end) - original_start) / time_map["tempo"]
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import MAX_CONCURRENT_JOBS
+from instrumentation import RunReport, current_job, progress_listener, text_listener
+from job_manifest import input_key
+from main import run_pipeline
+
+OUTPUT_DIR = "transcription_and_summaries"
+JOBS_DIR = os.path.join(OUTPUT_DIR, "jobs")
+JOB_FILE = "job.json"
+MAX_MESSAGES = 200
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobRunner:
+    """
+    Runs pipeline jobs on a background thread pool, so a UI can submit a job and poll its progress
+    instead of blocking until it finishes. Every job gets an id and a directory {jobs_dir}/{id}/ whose
+    job.json holds its status, progress, messages and result; it is rewritten on every update, so
+    finished jobs can be shown again after a rerun, a reconnect or a restart of the process.
+    While the final summary is generated, its text so far is in the job's "summary_so_far".
+    """
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_JOBS, jobs_dir: str = JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="job")
+        self._jobs = {}    # id -> state of the jobs queued or running in this process; finished jobs are read from job.json
+        self._active = {}  # workspace key -> id of the job queued or running for it
+        self._lock = threading.Lock()
+
+    def submit(self, input_source: str, args: argparse.Namespace, job_key: str = None, cleanup_paths: tuple = ()) -> str:
+        """
+        Queues run_pipeline(input_source, args) and returns the job id.
+        `job_key` names the job's workspace (see run_pipeline). Jobs for the same key would share a workspace,
+        so while one is queued or running its id is returned instead of starting another.
+        `cleanup_paths` (e.g. an uploaded file) are deleted once the job succeeds.
+        """
+        key = job_key or input_key(input_source)
+        with self._lock:
+            if key in self._active:
+                return self._active[key]
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "id": job_id,
+                "input": input_source,
+                "key": key,
+                "options": vars(args),
+                "cleanup_paths": list(cleanup_paths),
+                "status": "queued",
+                "progress": 0.0,
+                "messages": [],
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "summary_so_far": "",
+            }
+            self._jobs[job_id] = job
+            self._active[key] = job_id
+            self._save(job)
+        self.executor.submit(self._run, job_id, key, input_source, args, cleanup_paths)
+        return job_id
+
+    def resubmit(self, job_id: str) -> str:
+        """
+        Submits a failed or interrupted job again with the same input and options; it resumes from its manifest.
+        """
+        job = self.get(job_id)
+        return self.submit(job["input"], argparse.Namespace(**job["options"]), job["key"], tuple(job["cleanup_paths"]))
+
+    def get(self, job_id: str) -> dict:
+        """
+        Returns a snapshot of the job's state, or None for an unknown id.
+        Jobs of an earlier process are read from their job.json; if they never finished there, they are
+        reported as "interrupted" (submitting the same input again resumes them from their manifest).
+        """
+        if not re.fullmatch(r"[0-9a-f]{12}", job_id or ""):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return {**job, "messages": list(job["messages"])}
+        try:
+            with open(self._job_file(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job["status"] in ACTIVE_STATUSES:
+            job["status"] = "interrupted"
+        return job
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id, JOB_FILE)
+
+    def _save(self, job: dict):
+        path = self._job_file(job["id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id: str, message: str = None, progress: float = None, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            if message:
+                job["messages"] = (job["messages"] + [message])[-MAX_MESSAGES:]
+            if progress is not None:
+                # Sections finish in any order; never move the bar back
+                job["progress"] = max(job["progress"], min(progress, 1.0))
+            job.update(fields)
+            self._save(job)
+
+    def _append_summary(self, job_id: str, delta: str):
+        # Kept in memory only (job.json gets it with the next update): it matters while the job runs
+        with self._lock:
+            job = self._jobs[job_id]
+            job["summary_so_far"] += delta
+
+    def _run(self, job_id: str, key: str, input_source: str, args: argparse.Namespace, cleanup_paths: tuple):
+        self._update(job_id, status="running", started_at=time.time())
+        # The id follows the job onto every worker thread, so the report only collects this job's stages
+        token = current_job.set(job_id)
+        report = RunReport(input_source, job=job_id)
+        result = None
+        error = None
+        try:
+            with report, progress_listener(lambda message, fraction: self._update(job_id, message, fraction)), \
+                    text_listener(lambda delta: self._append_summary(job_id, delta)):
+                result = run_pipeline(input_source, args, OUTPUT_DIR, job_key=key)
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+        finally:
+            current_job.reset(token)
+
+        if result is not None:
+            report_path = f"{result['output_prefix']}_run_report.json"
+            report.save(report_path)
+            result["run_report"] = report_path
+            result["profile"] = report.format_profile()
+            # Counted per job: the process-wide counters mix the jobs that run at the same time
+            result["cache"] = report.cache_stats()
+            for path in cleanup_paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+            self._update(job_id, "Processing complete.", 1.0, status="done", result=result, finished_at=time.time())
+        else:
+            # Failures the pipeline handled itself are explained in the messages
+            error = error or "Processing failed."
+            report.save(os.path.join(self.jobs_dir, job_id, "run_report.json"))
+            self._update(job_id, status="failed", error=error, finished_at=time.time())
+        with self._lock:
+            # Its job.json is final now; keeping every finished result in memory would grow without bound
+            self._jobs.pop(job_id, None)
+            self._active.pop(key, None)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache import result_cache
+from config import MAX_WORKERS, require_openai_api_key
+from instrumentation import RunReport
+from job_manifest import input_key
+from main import add_processing_arguments, process_input
+from worker_pools import configure_pools, shutdown_pools
+from lazy_imports import lazy_import
+
+yt_dlp = lazy_import("yt_dlp")
+
+OUTPUT_DIR = "transcription_and_summaries"
+LEDGER_FILE = os.path.join(OUTPUT_DIR, "processed.json")
+REPORT_FILE = os.path.join(OUTPUT_DIR, "batch_run_report.json")
+
+def read_manifest(manifest_path: str) -> list:
+    """
+    Reads a manifest file with one YouTube URL, playlist URL or local file path per line.
+    Blank lines and lines starting with # are ignored.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+def is_playlist_url(url: str) -> bool:
+    return url.startswith("http") and ("list=" in url or "/playlist" in url)
+
+def expand_playlist(url: str) -> list:
+    """
+    Returns the video URLs of a YouTube playlist, without downloading anything.
+    """
+    ydl_opts = {'quiet': True, 'extract_flat': 'in_playlist', 'skip_download': True}
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    except Exception as e:
+        print(f"Error reading playlist {url}: {e}")
+        return []
+    if info.get("_type") != "playlist":
+        return [url]
+    urls = []
+    for entry in info.get("entries") or []:
+        if not entry:
+            continue
+        entry_url = entry.get("url") or ""
+        if not entry_url.startswith("http") and entry.get("id"):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if entry_url:
+            urls.append(entry_url)
+    return urls
+
+def collect_inputs(inputs: list, manifest_path: str = None) -> list:
+    """
+    Expands playlists and manifests into a de-duplicated list of videos, in the order given.
+    """
+    sources = list(inputs)
+    if manifest_path:
+        sources += read_manifest(manifest_path)
+    expanded = []
+    seen = set()
+    for source in sources:
+        for item in (expand_playlist(source) if is_playlist_url(source) else [source]):
+            key = input_key(item)
+            if key not in seen:
+                seen.add(key)
+                expanded.append(item)
+    return expanded
+
+class ProcessedLedger:
+    """
+    Records which videos were already processed, so re-running a batch skips them.
+    """
+
+    def __init__(self, path: str = LEDGER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_processed(self, source: str) -> bool:
+        with self._lock:
+            return input_key(source) in self.entries
+
+    def mark_processed(self, source: str, output_prefix: str):
+        with self._lock:
+            self.entries[input_key(source)] = {"source": source, "output_prefix": output_prefix}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+def run_batch(sources: list, args: argparse.Namespace, ledger: ProcessedLedger, jobs: int) -> tuple[int, int, int]:
+    """
+    Processes every source with up to `jobs` jobs at a time, skipping the ones already in the ledger.
+    Returns (processed, skipped, failed) counts.
+    """
+    pending = [source for source in sources if args.force or not ledger.is_processed(source)]
+    skipped = len(sources) - len(pending)
+    processed = failed = 0
+
+    def run_job(source):
+        print(f"[batch] Starting {source}")
+        return process_input(source, args, OUTPUT_DIR)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="job") as executor:
+        futures = {executor.submit(run_job, source): source for source in pending}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                output_prefix = future.result()
+            except Exception as e:
+                print(f"[batch] Failed {source}: {e}")
+                failed += 1
+                continue
+            if output_prefix is None:
+                print(f"[batch] Failed {source}")
+                failed += 1
+            else:
+                ledger.mark_processed(source, output_prefix)
+                print(f"[batch] Done {source} -> {output_prefix}")
+                processed += 1
+    return processed, skipped, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Video Summarizer - batch mode")
+    parser.add_argument("inputs", nargs="*", help="YouTube URLs, playlist URLs or local video file paths")
+    parser.add_argument("--manifest", help="File with one URL or path per line")
+    parser.add_argument("--jobs", type=int, default=2, help="Videos processed at the same time (default: 2)")
+    parser.add_argument("--download-workers", type=int, default=2, help="Concurrent downloads across all jobs (default: 2)")
+    parser.add_argument("--ffmpeg-workers", type=int, default=os.cpu_count() or 2, help="Concurrent ffmpeg processes across all jobs (default: number of CPUs)")
+    parser.add_argument("--api-workers", type=int, default=MAX_WORKERS * 2, help=f"Concurrent OpenAI calls across all jobs (default: {MAX_WORKERS * 2})")
+    parser.add_argument("--force", action="store_true", help="Process videos again even if they were already processed")
+    add_processing_arguments(parser)
+    args = parser.parse_args()
+    try:
+        require_openai_api_key()
+    except ValueError as e:
+        parser.error(str(e))
+
+    sources = collect_inputs(args.inputs, args.manifest)
+    if not sources:
+        parser.error("no inputs given (pass URLs/paths or --manifest)")
+
+    configure_pools(args.download_workers, args.ffmpeg_workers, args.api_workers)
+    try:
+        with RunReport("batch") as report:
+            processed, skipped, failed = run_batch(sources, args, ProcessedLedger(), args.jobs)
+    finally:
+        shutdown_pools()
+    report.save(REPORT_FILE)
+    print(f"Run report saved to {REPORT_FILE}.")
+    if args.profile:
+        print(report.format_profile())
+
+    cache_stats = result_cache.stats()
+    print(f"\nBatch complete: {processed} processed, {skipped} skipped, {failed} failed.")
+    print(f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup benchmark: times `import main` and `python main.py --help` in fresh interpreters and checks that the
+heavy dependencies (openai, yt_dlp, ffmpeg, tiktoken) are not imported until they are used.
+Runs without OPENAI_API_KEY, since startup must not need it. Exits with 1 if a heavy module is loaded at
+import or a median exceeds --max-ms, so it can guard startup time in CI.
+
+    python benchmarks/import_time.py --runs 10 --max-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+
+HEAVY_MODULES = ("openai", "yt_dlp", "ffmpeg", "tiktoken")
+
+# Runs in the child interpreter: imports main and reports the time and which heavy modules got loaded
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+def time_import() -> dict:
+    """
+    Imports main in a fresh interpreter; returns {"seconds", "loaded"}.
+    """
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=REPO_DIR, env=child_env(),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def time_help() -> float:
+    """
+    Runs `main.py --help` in a fresh interpreter and returns its wall-clock seconds.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=REPO_DIR, env=child_env(),
+                   capture_output=True, check=True)
+    return time.perf_counter() - start
+
+def slowest_imports(top: int) -> list:
+    """
+    Returns the `top` modules with the largest cumulative import time under `python -X importtime`.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=REPO_DIR,
+                         env=child_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return [(name, microseconds / 1000) for microseconds, name in rows[:top]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement; the median is reported (default: 5)")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import or --help time exceeds this many milliseconds")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list (default: 10)")
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    import_ms = statistics.median(run["seconds"] for run in imports) * 1000
+    help_ms = statistics.median(time_help() for _ in range(args.runs)) * 1000
+    loaded = sorted({module for run in imports for module in run["loaded"]})
+
+    print(f"import main:        {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"main.py --help:     {help_ms:8.1f} ms (median of {args.runs})")
+    print("Slowest imports (cumulative):")
+    for name, ms in slowest_imports(args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+    if args.max_ms is not None:
+        for label, ms in (("import main", import_ms), ("main.py --help", help_ms)):
+            if ms > args.max_ms:
+                failures.append(f"{label} took {ms:.1f} ms (limit {args.max_ms:.1f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Local stand-in for the OpenAI endpoints the pipeline uses (Whisper transcriptions and chat completions),
+so benchmarks run offline and for free. Point the pipeline at it with OPENAI_BASE_URL=http://host:port/v1.
+Latency, error rate and rate limits are configurable to reproduce production conditions.
+Chat completions support stream=True (server-sent events, with the usage chunk of stream_options.include_usage).
+"""
+import argparse
+import email
+import email.policy
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the pipeline splits long videos into chunks and every chunk is transcribed before the summaries "
+    "are reduced into one final summary that keeps the main ideas key points and conclusion"
+).split()
+WORDS_PER_MINUTE = 150
+SEGMENT_SECONDS = 5.0
+STREAM_CHUNK_WORDS = 3
+
+class MockSettings:
+    """
+    Behavior of the mock server. Latencies are in seconds; error_rate is the share of requests
+    answered with a 500; requests_per_minute (0 = unlimited) answers 429 with retry-after-ms above it.
+    """
+
+    def __init__(self, latency: float = 0.2, latency_per_audio_minute: float = 0.5, latency_per_1k_tokens: float = 0.5,
+                 error_rate: float = 0.0, requests_per_minute: int = 0, seed: int = 0):
+        self.latency = latency
+        self.latency_per_audio_minute = latency_per_audio_minute
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_times = []
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def admit(self) -> tuple[int, float]:
+        """
+        Decides the fate of a request: returns (status, retry_after_seconds).
+        """
+        with self.lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            if self.requests_per_minute:
+                self.request_times = [t for t in self.request_times if now - t < 60]
+                if len(self.request_times) >= self.requests_per_minute:
+                    self.counts["rate_limited"] += 1
+                    return 429, 60 - (now - self.request_times[0])
+                self.request_times.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.counts["errors"] += 1
+                return 500, 0.0
+        return 200, 0.0
+
+def fake_words(count: int, offset: int = 0) -> str:
+    words = [WORDS[(offset + i) % len(WORDS)] for i in range(count)]
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+def usage_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def audio_duration(audio: bytes) -> float:
+    # ffprobe needs a seekable file for some containers
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(audio)
+        path = f.name
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True
+        ).stdout.strip()
+        return float(output or 0.0)
+    except (OSError, ValueError):
+        return 0.0
+    finally:
+        os.remove(path)
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    message = email.message_from_bytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body, policy=email.policy.default
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        fields[name] = payload if part.get_filename() else payload.decode("utf-8")
+    return fields
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, retry_after = self.settings.admit()
+        if status == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {"retry-after-ms": str(int(retry_after * 1000))})
+            return
+        if status == 500:
+            time.sleep(self.settings.latency)
+            self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+            return
+        if self.path.endswith("/audio/transcriptions"):
+            self._transcription(parse_multipart(self.headers["Content-Type"], body))
+        elif self.path.endswith("/chat/completions"):
+            self._chat_completion(json.loads(body or b"{}"))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _transcription(self, fields: dict):
+        duration = audio_duration(fields.get("file") or b"")
+        time.sleep(self.settings.latency + self.settings.latency_per_audio_minute * duration / 60)
+        text = fake_words(max(1, int(duration / 60 * WORDS_PER_MINUTE)))
+        if fields.get("response_format") != "verbose_json":
+            self._send_json(200, {"text": text})
+            return
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + SEGMENT_SECONDS, duration)
+            count = max(1, int((end - start) / 60 * WORDS_PER_MINUTE))
+            segments.append({"id": len(segments), "start": start, "end": end, "text": " " + fake_words(count, len(segments))})
+            start = end
+        self._send_json(200, {"text": text, "language": "english", "duration": duration, "segments": segments})
+
+    def _chat_completion(self, request: dict):
+        prompt = "".join(message.get("content") or "" for message in request.get("messages", []))
+        prompt_tokens = usage_tokens(prompt)
+        content = "## Summary\n\n" + fake_words(min(600, max(20, prompt_tokens // 20)))
+        completion_tokens = usage_tokens(content)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._stream_chat_completion(request.get("model", "mock"), content, usage if include_usage else None)
+            return
+        time.sleep(self.settings.latency + self.settings.latency_per_1k_tokens * completion_tokens / 1000)
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream_chat_completion(self, model: str, content: str, usage: dict):
+        # The first chunk arrives after the base latency; the generation latency is spread over the chunks
+        words = content.split(" ")
+        pieces = [" ".join(words[i:i + STREAM_CHUNK_WORDS]) + " " for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+        pieces[-1] = pieces[-1][:-1]
+        chunk_latency = self.settings.latency_per_1k_tokens * usage_tokens(content) / 1000 / len(pieces)
+        time.sleep(self.settings.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(choices, chunk_usage=None):
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, "usage": chunk_usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for piece in pieces:
+            time.sleep(chunk_latency)
+            send([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage:
+            send([], usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def start_mock_server(settings: MockSettings, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts the mock server on a background thread (port 0 picks a free port) and returns it;
+    its base URL is f"http://{host}:{server.server_port}/v1". Call server.shutdown() to stop it.
+    """
+    handler = type("ConfiguredMockOpenAIHandler", (MockOpenAIHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.2, help="Base latency of every request in seconds (default: 0.2)")
+    parser.add_argument("--latency-per-audio-minute", type=float, default=0.5, help="Extra transcription latency per audio minute (default: 0.5)")
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.5, help="Extra completion latency per 1000 output tokens (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500 (default: 0)")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429 (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the simulated errors")
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    return MockSettings(args.latency, args.latency_per_audio_minute, args.latency_per_1k_tokens, args.error_rate, args.rpm, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8775, help="Port to listen on (default: 8775; the job service uses 8765)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server = start_mock_server(settings_from_args(args), args.host, args.port)
+    print(f"Mock OpenAI server listening on http://{args.host}:{server.server_port}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Offline benchmark of the main.py flows (short, equal, timestamps).
+Generates a synthetic video, starts the mock OpenAI server and points the pipeline at it, then times every
+flow end to end and per stage. Throughput is reported in audio minutes processed per wall-clock minute.
+Results are saved as JSON; pass --baseline with an earlier result file to flag regressions.
+
+    python benchmarks/run_benchmarks.py --minutes 10 --chunks 4 --latency 0.3
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from mock_openai_server import add_mock_arguments, settings_from_args, start_mock_server
+from synthetic_media import generate_video
+
+FLOWS = ("short", "equal", "timestamps")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+def run_flow(flow: str, video_path: str, work_dir: str, args: argparse.Namespace) -> dict:
+    """
+    Runs one flow from the local video to the final summary and returns its timings.
+    """
+    # Imported here, once the environment points the pipeline at the mock server
+    import main as pipeline
+    from audio_extractor import extract_audio_from_video
+    from instrumentation import RunReport
+    from utils import get_audio_duration
+
+    flow_dir = tempfile.mkdtemp(prefix=f"{flow}_", dir=work_dir)
+    audio_path = os.path.join(flow_dir, "output.mp3")
+    output_prefix = os.path.join(flow_dir, flow)
+    with RunReport(flow) as report:
+        if not extract_audio_from_video(video_path, audio_path):
+            raise RuntimeError("Failed to extract audio from the synthetic video")
+        duration = get_audio_duration(audio_path)
+        if flow == "short":
+            pipeline.process_short_audio(audio_path, output_prefix, max_workers=args.workers)
+        elif flow == "equal":
+            pipeline.process_long_audio_equal(audio_path, output_prefix, num_chunks=args.chunks, max_workers=args.workers, in_memory_chunks=args.in_memory_chunks)
+        else:
+            section = duration / args.chunks
+            timestamps = [(i * section, f"Section_{i + 1}") for i in range(args.chunks)]
+            pipeline.process_long_audio_timestamps(audio_path, output_prefix, timestamps, max_workers=args.workers, in_memory_chunks=args.in_memory_chunks)
+    shutil.rmtree(flow_dir, ignore_errors=True)
+    return {
+        "audio_minutes": duration / 60,
+        "wall_seconds": report.wall_seconds,
+        "stages": report.stages(),
+    }
+
+def summarize_runs(runs: list) -> dict:
+    """
+    Keeps the median run (by wall time) of a flow and adds its throughput.
+    """
+    median = sorted(runs, key=lambda run: run["wall_seconds"])[len(runs) // 2]
+    return {
+        **median,
+        "runs": len(runs),
+        "wall_seconds_all": [run["wall_seconds"] for run in runs],
+        "audio_minutes_per_wall_minute": median["audio_minutes"] / (median["wall_seconds"] / 60),
+    }
+
+def compare_to_baseline(results: dict, baseline_path: str, tolerance: float) -> list:
+    """
+    Returns a description of every flow whose throughput dropped more than tolerance (a fraction) below the baseline.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for flow, result in results["flows"].items():
+        previous = baseline.get("flows", {}).get(flow)
+        if not previous:
+            continue
+        before = previous["audio_minutes_per_wall_minute"]
+        after = result["audio_minutes_per_wall_minute"]
+        change = (after - before) / before
+        print(f"{flow:<12} {before:8.2f} -> {after:8.2f} audio min/wall min ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(f"{flow}: throughput {change:+.1%}")
+    return regressions
+
+def format_results(results: dict) -> str:
+    lines = [f"{'flow':<12} {'audio min':>10} {'wall s':>8} {'audio min/wall min':>19}  slowest stages"]
+    for flow, result in results["flows"].items():
+        stages = sorted(result["stages"].items(), key=lambda item: -item[1]["seconds"])[:3]
+        slowest = ", ".join(f"{name} {total['seconds']:.1f}s" for name, total in stages)
+        lines.append(
+            f"{flow:<12} {result['audio_minutes']:>10.1f} {result['wall_seconds']:>8.2f} "
+            f"{result['audio_minutes_per_wall_minute']:>19.2f}  {slowest}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the summarization pipeline")
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=list(FLOWS), help="Flows to run (default: all)")
+    parser.add_argument("--minutes", type=float, default=10, help="Length of the synthetic video in minutes (default: 10)")
+    parser.add_argument("--chunks", type=int, default=4, help="Chunks/sections of the equal and timestamps flows (default: 4)")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks processed concurrently (default: 4)")
+    parser.add_argument("--in-memory-chunks", action="store_true", help="Cut chunks into memory instead of temporary files")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per flow; the median is reported (default: 1)")
+    parser.add_argument("--output", help=f"Result file (default: {RESULTS_DIR}/benchmark_<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Throughput drop that counts as a regression (default: 0.1 = 10%%)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    settings = settings_from_args(args)
+    server = start_mock_server(settings)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["CACHE_ENABLED"] = "0"  # Every run must do the real work
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        print(f"Generating a {args.minutes:g} minute synthetic video...")
+        video_path = generate_video(os.path.join(work_dir, "synthetic.mp4"), args.minutes * 60)
+        results = {
+            "created_at": time.time(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+            "flows": {},
+        }
+        for flow in args.flows:
+            runs = []
+            for i in range(args.repeat):
+                print(f"\n=== {flow} (run {i + 1}/{args.repeat}) ===")
+                runs.append(run_flow(flow, video_path, work_dir, args))
+            results["flows"][flow] = summarize_runs(runs)
+        results["mock_server"] = dict(settings.counts)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + format_results(results))
+    print(f"Mock server: {results['mock_server']}")
+    print(f"Results saved to {output_path}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
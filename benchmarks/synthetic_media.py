@@ -0,0 +1,53 @@
+"""
+Generates synthetic audio and video of any length with ffmpeg, for benchmarks.
+The audio alternates tones and pauses, so silence detection and pause snapping have work to do.
+"""
+import argparse
+import os
+import subprocess
+
+# Every period: TONE_SECONDS of a tone whose pitch changes each period, then a pause
+PERIOD_SECONDS = 10
+TONE_SECONDS = 8.5
+
+def _audio_expression() -> str:
+    return f"0.4*sin(2*PI*(220+40*mod(floor(t/{PERIOD_SECONDS}),8))*t)*lt(mod(t,{PERIOD_SECONDS}),{TONE_SECONDS})"
+
+def generate_audio(path: str, duration_seconds: float, sample_rate: int = 16000) -> str:
+    """
+    Writes duration_seconds of mono synthetic speech-like audio to path (format from the extension).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"aevalsrc='{_audio_expression()}':s={sample_rate}:d={duration_seconds}",
+        "-ac", "1", "-b:a", "96k", path
+    ], check=True)
+    return path
+
+def generate_video(path: str, duration_seconds: float, size: str = "320x240", rate: int = 5) -> str:
+    """
+    Writes a small test-pattern video with the synthetic audio track to path (e.g. an .mp4 file).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate={rate}:duration={duration_seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc='{_audio_expression()}':s=44100:d={duration_seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path
+    ], check=True)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic media for benchmarks")
+    parser.add_argument("output", help="Output file (.mp3/.wav/.ogg for audio, .mp4/.mkv for video)")
+    parser.add_argument("--minutes", type=float, default=10, help="Length in minutes (default: 10)")
+    args = parser.parse_args()
+    if os.path.splitext(args.output)[1].lower() in (".mp4", ".mkv", ".mov", ".avi"):
+        generate_video(args.output, args.minutes * 60)
+    else:
+        generate_audio(args.output, args.minutes * 60)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from config import CACHE_ENABLED, CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Returns the SHA-256 hex digest of data (the same as copy_and_hash of a file with that content).
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def copy_and_hash(source, path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Copies a readable file-like object to path block by block, so memory use doesn't depend on its size,
+    and returns the SHA-256 hex digest of what was copied.
+    """
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        for block in iter(lambda: source.read(block_size), b""):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+def make_key(*parts: str) -> str:
+    """
+    Builds a cache key from its parts (e.g. kind, model, prompt, content hash).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = str(part).encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") don't collide
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Persistent content-addressed cache of API results, stored as one JSON file per key.
+    Entries not used for `max_age_seconds` are evicted, and the least recently used
+    entries are evicted whenever the cache grows beyond `max_bytes`.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_age_seconds: float, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None  # Total size on disk, computed on first write
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Returns the cached value for `key`, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value) -> None:
+        """
+        Stores a JSON-serializable value under `key`, evicting old entries if needed.
+        """
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The CLI, the web app and the job service workers share the cache directory, so the name includes the process
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        try:
+            # Overwriting an entry replaces its size instead of adding to it
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._evict()
+            else:
+                self._size += os.path.getsize(path) - old_size
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _evict(self) -> None:
+        # Must be called with the lock held
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._size = total
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+# Shared cache used by transcription and summarization
+result_cache = ResultCache(CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS * 24 * 3600, enabled=CACHE_ENABLED)
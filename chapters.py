@@ -0,0 +1,66 @@
+import bisect
+import os
+from audio_chunker import plan_audio_cuts, chunk_extension, job_work_dir, split_audio_single_pass, memory_chunks, release_chunk
+from audio_extractor import to_original_time
+from chunk_processor import run_concurrently, transcribe_chunk_segments
+from config import MAX_WORKERS, IN_MEMORY_CHUNKS
+from utils import get_audio_duration
+
+def transcribe_with_timestamps(audio_path: str, num_chunks: int = None, max_workers: int = MAX_WORKERS, time_map: dict = None, in_memory: bool = IN_MEMORY_CHUNKS) -> tuple[list, float]:
+    """
+    Transcribes the whole audio with segment-level timestamps.
+    The audio is cut at pauses into the fewest chunks that fit the upload limit (or num_chunks if that
+    is larger), which are transcribed concurrently;
+    segment times are shifted back onto the timeline of the original audio (through `time_map` when the
+    audio was compressed by compress_audio). With in_memory, chunks are cut into memory instead of files.
+    Returns (segments, total_cost), segments sorted by start time.
+    """
+    work_dir = job_work_dir(audio_path)
+    total_duration = get_audio_duration(audio_path)
+    if total_duration == 0:
+        return [], 0.0
+    plan = plan_audio_cuts(audio_path, total_duration, num_chunks)
+    if in_memory:
+        created = memory_chunks(audio_path, plan)
+        offsets = [start for start, _ in plan]
+    else:
+        extension = chunk_extension(audio_path)
+        chunk_filenames = [os.path.join(work_dir, f"chunk_segments_{i}.{extension}") for i in range(len(plan))]
+        created = split_audio_single_pass(audio_path, plan, chunk_filenames)
+        offsets = [start for (start, _), f in zip(plan, chunk_filenames) if f in created]
+
+    try:
+        results = run_concurrently(transcribe_chunk_segments, created, max_workers)
+    finally:
+        for chunk in created:
+            release_chunk(chunk)
+
+    segments = []
+    total_cost = 0.0
+    for offset, (chunk_segments, cost) in zip(offsets, results):
+        total_cost += cost
+        for segment in chunk_segments:
+            segments.append({
+                "start": to_original_time(segment["start"] + offset, time_map),
+                "end": to_original_time(segment["end"] + offset, time_map),
+                "text": segment["text"]
+            })
+    return segments, total_cost
+
+def assign_segments_to_chapters(segments: list, timestamps: list) -> list:
+    """
+    Groups transcript segments into chapters without touching the audio.
+    `timestamps` is a list of tuples (start_time_in_seconds, label); a segment belongs to the
+    chapter its midpoint falls in (segments before the first chapter go to the first one).
+    Returns a list of tuples (label, chapter_text) in chapter order.
+    """
+    if not timestamps:
+        return []
+    chapters = sorted(timestamps, key=lambda t: t[0])
+    starts = [start for start, _ in chapters]
+    texts = [[] for _ in chapters]
+    for segment in segments:
+        midpoint = (segment["start"] + segment["end"]) / 2
+        index = max(bisect.bisect_right(starts, midpoint) - 1, 0)
+        texts[index].append(segment["text"])
+    return [(label, " ".join(chapter_texts)) for (_, label), chapter_texts in zip(chapters, texts)]
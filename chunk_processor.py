@@ -0,0 +1,112 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import MAX_WORKERS
+from worker_pools import get_api_executor
+from audio_chunker import is_memory_chunk, read_chunk
+from transcription import transcribe_audio, transcribe_audio_segments
+from summarization import generate_summary
+
+def run_concurrently(func, items: list, max_workers: int = MAX_WORKERS, on_item_done=None) -> list:
+    """
+    Calls func(item) for every item using at most max_workers threads.
+    Returns the results in the same order as items, whatever order they finish in.
+    `on_item_done(index, result)` is called from the calling thread as each item finishes,
+    so it is safe to print, save files or update a Streamlit UI from it.
+    When a shared API pool is configured (see worker_pools), items run there instead and
+    max_workers is ignored.
+    """
+    results = [None] * len(items)
+    if not items:
+        return results
+    shared_executor = get_api_executor()
+    if shared_executor is not None:
+        _collect(shared_executor, func, items, results, on_item_done)
+        return results
+    workers = max(1, min(max_workers, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        _collect(executor, func, items, results, on_item_done)
+    return results
+
+def _submit(executor, func, item):
+    # Each item runs in a copy of the caller's context, so it keeps the job's id and progress listener
+    return executor.submit(contextvars.copy_context().run, func, item)
+
+def _collect(executor, func, items, results, on_item_done):
+    futures = {_submit(executor, func, item): i for i, item in enumerate(items)}
+    try:
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if on_item_done:
+                on_item_done(i, results[i])
+    except BaseException:
+        # Don't start items that are still queued if one of them failed
+        for future in futures:
+            future.cancel()
+        raise
+
+def run_as_they_arrive(func, items, max_workers: int = MAX_WORKERS, on_item_done=None) -> list:
+    """
+    Like run_concurrently, but items is an iterable that may still be producing (e.g. chunks of a
+    download in progress): each item is submitted as soon as it is yielded.
+    `on_item_done(index, result)` is called from the calling thread, between items and at the end.
+    Returns the results in the order the items were yielded.
+    """
+    shared_executor = get_api_executor()
+    executor = shared_executor or ThreadPoolExecutor(max_workers=max(1, max_workers))
+    futures = []
+    reported = set()
+
+    def report(future):
+        i = futures.index(future)
+        if i not in reported:
+            reported.add(i)
+            if on_item_done:
+                on_item_done(i, future.result())
+
+    try:
+        for item in items:
+            futures.append(_submit(executor, func, item))
+            for future in [f for f in futures if f.done()]:
+                report(future)
+        for future in as_completed(futures):
+            report(future)
+        return [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        if shared_executor is None:
+            executor.shutdown(wait=True)
+
+def transcribe_chunk(chunk) -> tuple[str, float]:
+    """
+    Transcribes a chunk file, or a memory chunk (see audio_chunker.memory_chunks), which is cut into
+    memory here, in the worker, and uploaded from there with the duration of the cut plan.
+    """
+    if is_memory_chunk(chunk):
+        return transcribe_audio(read_chunk(chunk), chunk["duration"])
+    return transcribe_audio(chunk)
+
+def transcribe_chunk_segments(chunk) -> tuple[list, float]:
+    """
+    Same as transcribe_chunk, with segment-level timestamps (see transcribe_audio_segments).
+    """
+    if is_memory_chunk(chunk):
+        return transcribe_audio_segments(read_chunk(chunk), chunk["duration"])
+    return transcribe_audio_segments(chunk)
+
+def transcribe_concurrently(chunk_files: list, max_workers: int = MAX_WORKERS, on_chunk_done=None) -> list:
+    """
+    Transcribes every chunk (file or memory chunk) using at most max_workers threads.
+    Returns a list of (transcript, transcript_cost) in chunk order.
+    """
+    return run_concurrently(transcribe_chunk, chunk_files, max_workers, on_chunk_done)
+
+def summarize_concurrently(texts: list, max_workers: int = MAX_WORKERS, on_summary_done=None) -> list:
+    """
+    Summarizes every text using at most max_workers threads.
+    Returns a list of (summary, summary_cost) in the same order as texts.
+    """
+    return run_concurrently(generate_summary, texts, max_workers, on_summary_done)
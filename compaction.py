@@ -0,0 +1,99 @@
+import re
+from collections import Counter
+
+# Longest phrase (in words) whose back-to-back repetitions are collapsed, and how many
+# repetitions in a row make a run: Whisper loops a phrase over silence or music ("Thank you. Thank you. ...")
+MAX_NGRAM = 8
+MIN_REPEATS = 3
+
+# Hesitation sounds only: words that can carry meaning ("like", "tipo", "né") are kept
+FILLERS = {
+    "en": ("um", "umm", "uh", "uhh", "uhm", "erm", "hmm", "mm", "mhm", "mm-hmm"),
+    "pt": ("hã", "ãh", "ahn", "hum", "humm", "hmm", "éé", "ééé"),
+}
+
+# Frequent short words, used to tell Portuguese from English (Portuguese "um" is a word, not a filler)
+LANGUAGE_MARKERS = {
+    "en": {"the", "and", "is", "to", "of", "that", "it", "you", "this", "with"},
+    "pt": {"de", "que", "não", "é", "para", "com", "uma", "os", "está", "mas"},
+}
+
+_filler_patterns = {
+    language: re.compile(
+        r"(?<![\w-])(?:" + "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True)) + r")(?![\w-])[,.…]*\s*",
+        re.IGNORECASE,
+    )
+    for language, words in FILLERS.items()
+}
+
+_PUNCTUATION = ".,;:!?…\"()[]«»“”"
+
+def detect_language(text: str) -> str:
+    """
+    Returns "pt" or "en", whichever language's frequent words appear more often in text.
+    """
+    words = Counter(re.findall(r"\w+", text.lower()))
+    counts = {language: sum(words[word] for word in markers) for language, markers in LANGUAGE_MARKERS.items()}
+    return max(counts, key=counts.get)
+
+def remove_fillers(text: str, language: str) -> str:
+    """
+    Removes hesitation sounds (um, uh, hã...) together with the punctuation that follows them.
+    """
+    return _filler_patterns[language].sub("", text)
+
+def _word_key(word: str) -> str:
+    # "Thank" and "thank," count as the same word
+    return word.lower().strip(_PUNCTUATION)
+
+def collapse_repeats(words: list, max_ngram: int = MAX_NGRAM, min_repeats: int = MIN_REPEATS) -> list:
+    """
+    Keeps one copy (the last) of every phrase of up to max_ngram words repeated at least min_repeats times in a row.
+    Each position is compared against at most max_ngram phrase lengths, and a run is skipped as a whole,
+    so the time is linear in the number of words.
+    """
+    keys = [_word_key(word) for word in words]
+    kept = []
+    i = 0
+    while i < len(words):
+        run = 0
+        for n in range(1, max_ngram + 1):
+            if i + n * min_repeats > len(words):
+                break
+            if keys[i] != keys[i + n]:
+                continue
+            phrase = keys[i:i + n]
+            repeats = 1
+            while keys[i + repeats * n:i + (repeats + 1) * n] == phrase:
+                repeats += 1
+            if repeats >= min_repeats:
+                run = n
+                break
+        if run:
+            # The last copy keeps the punctuation that ends the run
+            i += repeats * run
+            kept += words[i - run:i]
+        else:
+            kept.append(words[i])
+            i += 1
+    return kept
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces, removes spaces before punctuation and keeps at most one blank line between paragraphs.
+    """
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r" ([,.;:!?…])", r"\1", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def compact_transcript(text: str, language: str = None) -> str:
+    """
+    Shrinks a Whisper transcript before it is summarized: removes fillers, collapses repeated phrases
+    and normalizes whitespace. Paragraph breaks are kept. `language` ("en" or "pt") is detected when not given.
+    """
+    language = language or detect_language(text)
+    text = remove_fillers(text, language)
+    lines = [" ".join(collapse_repeats(line.split())) for line in text.split("\n")]
+    return normalize_whitespace("\n".join(lines))
@@ -4,9 +4,74 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("Please set the OPENAI_API_KEY in your .env file.")
+
+def require_openai_api_key() -> str:
+    """
+    Returns the OpenAI API key, or raises if it is not set. Checked when the key is needed,
+    not at import, so --help and argument errors work without credentials.
+    """
+    if not OPENAI_API_KEY:
+        raise ValueError("Please set the OPENAI_API_KEY in your .env file.")
+    return OPENAI_API_KEY
 
 WHISPER_COST_PER_MINUTE = 0.006  # $0.006/min
 GPT4_INPUT_COST_PER_K = 0.005    # $0.005/1k tokens input
-GPT4_OUTPUT_COST_PER_K = 0.015   # $0.015/1k tokens output
\ No newline at end of file
+GPT4_OUTPUT_COST_PER_K = 0.015   # $0.015/1k tokens output
+
+# Whisper rejects uploads larger than 25 MB; keep a margin for container overhead and VBR peaks
+WHISPER_MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+UPLOAD_SAFETY_MARGIN = 0.95
+
+# Chunk cuts are moved to the nearest pause within this many seconds (0 disables it)
+SILENCE_SNAP_TOLERANCE = float(os.getenv("SILENCE_SNAP_TOLERANCE", "10"))
+
+# Optional preprocessing before upload: pauses longer than this are shortened to SILENCE_TRIM_KEEP seconds
+SILENCE_TRIM_MIN_DURATION = float(os.getenv("SILENCE_TRIM_MIN_DURATION", "1.0"))
+SILENCE_TRIM_KEEP = 0.3
+
+# How YouTube audio is ingested: "native" keeps the published stream (m4a/webm) without transcoding,
+# "opus" transcodes once to compact 16kHz mono Opus, "mp3" transcodes to 96 kbps MP3
+YOUTUBE_AUDIO_FORMAT = os.getenv("YOUTUBE_AUDIO_FORMAT", "native")
+
+# Length of the chunks emitted while a YouTube download is still streaming
+STREAM_SEGMENT_SECONDS = float(os.getenv("STREAM_SEGMENT_SECONDS", "600"))
+
+# Cut chunks with ffmpeg straight into memory and upload them from there, instead of through temp files
+IN_MEMORY_CHUNKS = os.getenv("IN_MEMORY_CHUNKS", "0") == "1"
+
+# Maximum number of chunks transcribed/summarized at the same time
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))
+
+# Jobs the Streamlit app runs in the background at the same time; later ones wait in a queue
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+
+# Job service (job_service.py): queue database, worker processes and HTTP port
+JOB_SERVICE_DB = os.getenv("JOB_SERVICE_DB", os.path.join("transcription_and_summaries", "job_service.db"))
+JOB_SERVICE_WORKERS = int(os.getenv("JOB_SERVICE_WORKERS", "2"))
+JOB_SERVICE_PORT = int(os.getenv("JOB_SERVICE_PORT", "8765"))
+
+# Alternative OpenAI-compatible endpoint, e.g. the local mock server used by benchmarks/
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Client-side OpenAI rate limits (set them to your account's tier; 0 disables a limit) and retries
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000"))
+OPENAI_AUDIO_MINUTES_PER_MINUTE = float(os.getenv("OPENAI_AUDIO_MINUTES_PER_MINUTE", "0"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+# On-disk cache for transcripts and summaries
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") != "0"
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "500")) * 1024 * 1024
+CACHE_MAX_AGE_DAYS = float(os.getenv("CACHE_MAX_AGE_DAYS", "30"))
+
+# Token budget per summarization call and fan-out of the summary reduce tree
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "16000"))
+SUMMARY_FAN_OUT = int(os.getenv("SUMMARY_FAN_OUT", "4"))
+SUMMARY_EXPECTED_OUTPUT_TOKENS = 800  # Used to estimate reduce inputs and output cost
+
+# Remove fillers and repeated phrases from transcripts before they are summarized (see compaction.py)
+COMPACT_TRANSCRIPTS = os.getenv("COMPACT_TRANSCRIPTS", "1") != "0"
+
+# SQLite full-text index of every finished job's transcripts and summaries (see search_index.py)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join("transcription_and_summaries", "search_index.db"))
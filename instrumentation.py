@@ -0,0 +1,216 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Metrics summed per stage in run reports
+METRICS = ("bytes", "audio_seconds", "input_tokens", "output_tokens", "cost")
+
+# Stages that look their result up in cache.result_cache first (their events carry "cached" on a hit)
+CACHED_STAGES = ("transcription", "summary")
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+# Id of the job the current code runs for, copied into its stage events. Context variables follow
+# the work onto the worker threads of chunk_processor and the OpenAI client's event loop.
+current_job = contextvars.ContextVar("current_job", default=None)
+_progress_listener = contextvars.ContextVar("progress_listener", default=None)
+_text_listener = contextvars.ContextVar("text_listener", default=None)
+
+def add_hook(hook):
+    """
+    Registers hook(event) to be called after every instrumented stage.
+    The event is a dict with "stage", "seconds", "started_at", "thread", "error" (on failure)
+    and whatever metrics the stage recorded (see METRICS) plus identifying fields such as "item".
+    Hooks are called from the thread that ran the stage, so they must be thread-safe.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+def remove_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+def _emit(event: dict):
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            print(f"Instrumentation hook failed: {e}")
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+@contextlib.contextmanager
+def progress_listener(listener):
+    """
+    Sends the notify() calls made inside the block (and by the work it starts) to
+    listener(message, fraction) instead of printing them.
+    """
+    token = _progress_listener.set(listener)
+    try:
+        yield
+    finally:
+        _progress_listener.reset(token)
+
+def notify(message: str, fraction: float = None):
+    """
+    Reports pipeline progress: a message for the user and, when known, the share of the job done (0 to 1).
+    Printed unless a progress_listener is active.
+    """
+    listener = _progress_listener.get()
+    if listener is None:
+        print(message)
+        return
+    try:
+        listener(message, fraction)
+    except Exception as e:
+        print(f"Progress listener failed: {e}")
+
+@contextlib.contextmanager
+def text_listener(listener):
+    """
+    Sends the text that notify_text() streams inside the block (the final summary, as it is generated)
+    to listener(delta).
+    """
+    token = _text_listener.set(listener)
+    try:
+        yield
+    finally:
+        _text_listener.reset(token)
+
+def notify_text(delta: str):
+    """
+    Reports the next piece of the final summary while it is generated. Dropped unless a text_listener is active.
+    """
+    listener = _text_listener.get()
+    if listener is None:
+        return
+    try:
+        listener(delta)
+    except Exception as e:
+        print(f"Text listener failed: {e}")
+
+@contextlib.contextmanager
+def stage(name: str, **fields):
+    """
+    Times the block as one run of the pipeline stage `name` and reports it to the hooks.
+    Yields the event dict, so the block can record metrics on it (event["bytes"] = ...)
+    or mark a failure it handled itself (event["error"] = ...).
+    """
+    event = {"stage": name, **fields}
+    event["started_at"] = time.time()
+    event["thread"] = threading.current_thread().name
+    if current_job.get() is not None:
+        event["job"] = current_job.get()
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        event["error"] = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        event["seconds"] = time.perf_counter() - start
+        _emit(event)
+
+class RunReport:
+    """
+    Hook that collects every stage event of a run, used as a context manager around the run.
+    Summarizes wall time and metrics per stage, saves them as JSON and formats a profile.
+    With a job id, only the events of that job (see current_job) are collected.
+    """
+
+    def __init__(self, name: str = "run", job: str = None):
+        self.name = name
+        self.job = job
+        self.events = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    def __call__(self, event: dict):
+        if self.job is not None and event.get("job") != self.job:
+            return
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+        self.wall_seconds = time.perf_counter() - self._start
+        return False
+
+    def stages(self) -> dict:
+        """
+        Returns the totals per stage: calls, errors, seconds and every metric in METRICS.
+        """
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault(event["stage"], {"calls": 0, "errors": 0, "seconds": 0.0, **{m: 0 for m in METRICS}})
+            total["calls"] += 1
+            total["errors"] += 1 if event.get("error") else 0
+            total["seconds"] += event["seconds"]
+            for metric in METRICS:
+                total[metric] += event.get(metric) or 0
+        return totals
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the result cache hits and misses of this run, like cache.result_cache.stats() does for the process.
+        """
+        with self._lock:
+            lookups = [event for event in self.events if event["stage"] in CACHED_STAGES]
+        hits = sum(1 for event in lookups if event.get("cached"))
+        return {"hits": hits, "misses": len(lookups) - hits}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["started_at"])
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds or time.perf_counter() - self._start,
+            "stages": self.stages(),
+            "events": events,
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def format_profile(self) -> str:
+        """
+        Returns a table of the stages sorted by total time. Stages run concurrently, so their
+        share of the wall time can add up to more than 100%.
+        """
+        report = self.to_dict()
+        wall = report["wall_seconds"] or 1e-9
+        lines = [
+            f"Profile of {self.name}: {report['wall_seconds']:.2f}s wall time",
+            f"{'stage':<20} {'calls':>6} {'total s':>9} {'avg s':>8} {'% wall':>7} {'MB':>8} {'audio min':>10} {'tokens':>9} {'cost $':>8}",
+        ]
+        for name, total in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"{name:<20} {total['calls']:>6} {total['seconds']:>9.2f} {total['seconds'] / total['calls']:>8.2f} "
+                f"{100 * total['seconds'] / wall:>6.0f}% {total['bytes'] / 1e6:>8.1f} {total['audio_seconds'] / 60:>10.1f} "
+                f"{total['input_tokens'] + total['output_tokens']:>9} {total['cost']:>8.4f}"
+            )
+        return "\n".join(lines)
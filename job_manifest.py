@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+MANIFEST_FILE = "manifest.json"
+
+def input_key(source: str) -> str:
+    """
+    Identifies a video independently of how it was written: the YouTube video id for URLs,
+    and the absolute path, size and modification time for local files.
+    """
+    if source.startswith("http"):
+        match = re.search(r'(?:v=|youtu\.be/|/shorts/|/live/)([A-Za-z0-9_-]{11})', source)
+        return f"youtube:{match.group(1)}" if match else source
+    try:
+        stat = os.stat(source)
+        return f"file:{os.path.abspath(source)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return f"file:{os.path.abspath(source)}"
+
+def job_workspace(key: str, base_dir: str = "temp_media") -> str:
+    """
+    Returns the workspace directory of a job. The same input (see input_key) always gets the same
+    directory, so an interrupted job finds its manifest and files when it is run again.
+    """
+    return os.path.join(base_dir, "job_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16])
+
+def output_name(base_name: str, key: str) -> str:
+    """
+    Returns the name the saved files of a job start with: its title plus a short hash of its key, so two
+    videos with the same title (or a title clean_filename reduces to "") never overwrite each other's files.
+    """
+    return f"{base_name or 'video'}_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}"
+
+def section_keys(section_names: list) -> list:
+    """
+    Names the sections' manifest entries and files by their position in the chunk list plus their label,
+    since clean_label can give several sections the same label, or an empty one.
+    """
+    return [f"{i}_{name}" if name else str(i) for i, name in enumerate(section_names)]
+
+def _normalized(value):
+    # Compare options the way they read back from JSON (tuples become lists)
+    return json.loads(json.dumps(value))
+
+def _chunk_exists(chunk) -> bool:
+    # Memory chunks are dicts (see audio_chunker.memory_chunks) that are cut from their source audio
+    return os.path.exists(chunk["audio"] if isinstance(chunk, dict) else chunk)
+
+class JobManifest:
+    """
+    Checkpoints of a job, saved as manifest.json in its workspace after every change:
+    - steps: data of completed pipeline steps ("audio", "compressed", "cut", ...)
+    - sections: per chunk/section, the saved transcript and summary paths and their costs
+    """
+
+    def __init__(self, work_dir: str):
+        self.path = os.path.join(work_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault("steps", {})
+        self.data.setdefault("sections", {})
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def step(self, name: str, **options) -> dict:
+        """
+        Returns the data recorded by complete_step(name), or None if the step is not complete
+        or was completed with different options.
+        """
+        with self._lock:
+            data = self.data["steps"].get(name)
+            if data is None or any(data.get(key) != _normalized(value) for key, value in options.items()):
+                return None
+            return data
+
+    def complete_step(self, name: str, **data):
+        with self._lock:
+            self.data["steps"][name] = data
+            self._save()
+
+    def reset_sections(self):
+        """
+        Forgets every section, e.g. after the audio was cut again with different options.
+        """
+        with self._lock:
+            self.data["sections"] = {}
+            self._save()
+
+    def update_section(self, name: str, **data):
+        with self._lock:
+            self.data["sections"].setdefault(name, {}).update(data)
+            self._save()
+
+    def _load_section_file(self, name: str, field: str):
+        with self._lock:
+            section = self.data["sections"].get(name, {})
+        path = section.get(field)
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read(), section.get(f"{field}_cost", 0.0)
+
+    def load_transcript(self, name: str) -> tuple[str, float]:
+        """
+        Returns (transcript, cost) of a section transcribed in a previous run, or None.
+        """
+        return self._load_section_file(name, "transcript")
+
+    def load_summary(self, name: str) -> tuple[str, float]:
+        """
+        Returns (summary, cost) of a section summarized in a previous run, or None.
+        """
+        return self._load_section_file(name, "summary")
+
+    def resume_chunks(self, options: dict, cut) -> list:
+        """
+        Returns the chunks recorded by a previous run with the same options, as a list of
+        (chunk, section_name), as long as every chunk not yet transcribed can still be read
+        (a chunk is a file path, or a memory chunk whose source audio must exist).
+        Otherwise calls cut() (which returns the same list), records it and forgets the old sections.
+        """
+        data = self.step("cut", options=options)
+        if data is not None:
+            chunks = [tuple(chunk) for chunk in data["chunks"]]
+            keys = section_keys([name for _, name in chunks])
+            if all(_chunk_exists(chunk) or self.load_transcript(key) is not None for (chunk, _), key in zip(chunks, keys)):
+                return chunks
+        chunks = cut()
+        self.reset_sections()
+        self.complete_step("cut", options=options, chunks=[list(chunk) for chunk in chunks])
+        return chunks
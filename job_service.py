@@ -0,0 +1,463 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from config import JOB_SERVICE_DB, JOB_SERVICE_WORKERS, JOB_SERVICE_PORT, require_openai_api_key
+from instrumentation import RunReport, current_job, progress_listener
+from job_manifest import input_key
+from main import add_processing_arguments, run_pipeline
+
+OUTPUT_DIR = "transcription_and_summaries"
+POLL_SECONDS = 1.0
+MAX_MESSAGES = 200
+STATUSES = ("queued", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    input TEXT NOT NULL,
+    options TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    messages TEXT NOT NULL DEFAULT '[]',
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (key) WHERE status IN ('queued', 'running');
+"""
+
+def default_options() -> dict:
+    """
+    Returns the processing options (see main.add_processing_arguments) with their default values.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_processing_arguments(parser)
+    return vars(parser.parse_args([]))
+
+def parse_options(options: dict) -> dict:
+    """
+    Checks processing options sent as JSON against main.add_processing_arguments and converts them with
+    the same types and choices as the command line, e.g. {"tempo": 1.5, "workers": "4"}.
+    Returns every option (with defaults for the missing ones); raises ValueError for unknown options or bad values.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_processing_arguments(parser)
+    actions = {action.dest: action for action in parser._actions}
+    parsed = vars(parser.parse_args([]))
+    for name, value in options.items():
+        action = actions.get(name)
+        if action is None:
+            raise ValueError(f"unknown option: {name}")
+        if value is None and action.default is None:
+            parsed[name] = None
+            continue
+        if action.nargs == 0:
+            # Flags such as --stream: only JSON booleans
+            if not isinstance(value, bool):
+                raise ValueError(f"{name} must be true or false")
+            parsed[name] = value
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"invalid value for {name}: {value!r}")
+        try:
+            value = (action.type or str)(str(value))
+        except (ValueError, argparse.ArgumentTypeError) as e:
+            raise ValueError(f"invalid value for {name}: {e}")
+        if action.choices is not None and value not in action.choices:
+            raise ValueError(f"{name} must be one of: {', '.join(action.choices)}")
+        parsed[name] = value
+    return parsed
+
+def _options_key(options: dict) -> str:
+    return json.dumps(options, sort_keys=True)
+
+class JobQueue:
+    """
+    Durable job queue in a SQLite database, shared by the service, its worker processes and the CLI.
+    Jobs are claimed by priority (highest first), then in submission order. A video (see
+    job_manifest.input_key) has at most one queued or running job.
+    """
+
+    def __init__(self, path: str = JOB_SERVICE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per call: the HTTP server and the workers use the queue from many threads and processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _transaction(self, conn: sqlite3.Connection):
+        # Taken before reading, so two processes never claim or submit based on the same snapshot
+        conn.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["messages"] = json.loads(job["messages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, input_source: str, options: dict, priority: int = 0, force: bool = False) -> tuple[str, bool]:
+        """
+        Queues a job and returns (job_id, created).
+        The same input is never queued twice: while a job for it is queued or running, that job's id is
+        returned (with its priority raised to `priority` if lower). A finished job with the same options
+        is returned too, unless `force` asks to process the video again.
+        """
+        # Workers may run from another directory than the client that submitted a local file
+        if not input_source.startswith("http"):
+            input_source = os.path.abspath(input_source)
+        key = input_key(input_source)
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            row = conn.execute("SELECT id, priority FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)).fetchone()
+            if row is not None:
+                if priority > row["priority"]:
+                    conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row["id"]))
+                conn.execute("COMMIT")
+                return row["id"], False
+            if not force:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status = 'done' AND options = ? ORDER BY finished_at DESC LIMIT 1",
+                    (key, _options_key(options)),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("COMMIT")
+                    return row["id"], False
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute(
+                "INSERT INTO jobs (id, key, input, options, priority, status, created_at) VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, key, input_source, _options_key(options), priority, time.time()),
+            )
+            conn.execute("COMMIT")
+            return job_id, True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker_pid: int) -> dict:
+        """
+        Marks the next queued job as running on the given worker and returns it, or None if the queue is empty.
+        """
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ?, error = NULL WHERE id = ?",
+                (worker_pid, time.time(), row["id"]),
+            )
+            job = self._job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+            conn.execute("COMMIT")
+            return job
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def update(self, job_id: str, message: str = None, progress: float = None, **fields):
+        """
+        Appends a progress message and/or raises the progress (0 to 1; it never moves back), and sets `fields`.
+        """
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            row = conn.execute("SELECT messages, progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return
+            messages = json.loads(row["messages"])
+            if message:
+                messages = (messages + [message])[-MAX_MESSAGES:]
+            if progress is not None:
+                progress = max(row["progress"], min(progress, 1.0))
+            fields = {**fields, "messages": json.dumps(messages, ensure_ascii=False), "progress": progress if progress is not None else row["progress"]}
+            if "result" in fields and fields["result"] is not None:
+                fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> dict:
+        """
+        Returns the job with its options, messages and result, or None for an unknown id.
+        """
+        if not re.fullmatch(r"[0-9a-f]{12}", job_id or ""):
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._job(row) if row else None
+
+    def list_jobs(self, status: str = None, limit: int = 50) -> list:
+        """
+        Returns the most recent jobs (optionally only those with `status`), without their results.
+        """
+        sql = "SELECT id, input, priority, status, progress, created_at, started_at, finished_at, error FROM jobs"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def requeue(self, worker_pid: int = None) -> int:
+        """
+        Puts the running jobs of a worker that stopped (or of every worker) back in the queue; they resume
+        from their manifest. Returns the number of jobs requeued.
+        """
+        sql = "UPDATE jobs SET status = 'queued', worker_pid = NULL WHERE status = 'running'"
+        params = ()
+        if worker_pid is not None:
+            sql += " AND worker_pid = ?"
+            params = (worker_pid,)
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+def job_status(job: dict) -> dict:
+    """
+    The job as reported by the status API: everything but the result.
+    """
+    return {**{name: value for name, value in job.items() if name != "result"}, "has_result": job["result"] is not None}
+
+def run_job(queue: JobQueue, job: dict):
+    """
+    Runs one claimed job through run_pipeline, reporting its progress to the queue, and records its result or error.
+    """
+    job_id = job["id"]
+    # The id follows the job onto every worker thread, so the report only collects this job's stages
+    token = current_job.set(job_id)
+    report = RunReport(job["input"], job=job_id)
+    result = None
+    error = None
+    try:
+        with report, progress_listener(lambda message, fraction: queue.update(job_id, message, fraction)):
+            result = run_pipeline(job["input"], argparse.Namespace(**job["options"]), OUTPUT_DIR, job_key=job["key"])
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+    finally:
+        current_job.reset(token)
+
+    if result is not None:
+        report_path = f"{result['output_prefix']}_run_report.json"
+        report.save(report_path)
+        result["run_report"] = report_path
+        queue.update(job_id, "Processing complete.", 1.0, status="done", result=result, finished_at=time.time())
+    else:
+        # Failures the pipeline handled itself are explained in the messages
+        queue.update(job_id, status="failed", error=error or "Processing failed.", finished_at=time.time())
+
+def worker_loop(path: str, stop):
+    """
+    Worker process: claims and runs jobs one at a time until `stop` (a multiprocessing Event) is set.
+    """
+    queue = JobQueue(path)
+    try:
+        while not stop.is_set():
+            job = queue.claim(os.getpid())
+            if job is None:
+                stop.wait(POLL_SECONDS)
+                continue
+            run_job(queue, job)
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the whole process group; the service requeues the job that was cut short
+        pass
+
+def make_handler(queue: JobQueue):
+    """
+    Returns the request handler of the HTTP API:
+    POST /jobs {"input", "options", "priority", "force"} queues a job; GET /jobs lists jobs (?status=);
+    GET /jobs/<id> returns a job's status and GET /jobs/<id>/result its result.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/jobs":
+                status = parse_qs(url.query).get("status", [None])[0]
+                self._send(200, queue.list_jobs(status))
+                return
+            match = re.fullmatch(r"/jobs/([0-9a-f]{12})(/result)?", url.path)
+            job = queue.get(match.group(1)) if match else None
+            if job is None:
+                self._send(404, {"error": "job not found"})
+            elif not match.group(2):
+                self._send(200, job_status(job))
+            elif job["status"] != "done":
+                self._send(409, {"error": f"job is {job['status']}", "status": job["status"]})
+            else:
+                self._send(200, job["result"])
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                input_source = body["input"]
+                if not isinstance(input_source, str) or not input_source:
+                    raise ValueError("input must be a URL or file path")
+                if not isinstance(body.get("options") or {}, dict):
+                    raise ValueError("options must be an object")
+                options = parse_options(body.get("options") or {})
+                priority = int(body.get("priority", 0))
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": f"invalid request: {e}"})
+                return
+            job_id, created = queue.submit(input_source, options, priority, bool(body.get("force")))
+            self._send(201 if created else 200, {"id": job_id, "created": created, "status": queue.get(job_id)["status"]})
+
+    return Handler
+
+def serve(workers: int = JOB_SERVICE_WORKERS, host: str = "127.0.0.1", port: int = JOB_SERVICE_PORT, path: str = JOB_SERVICE_DB):
+    """
+    Runs the HTTP API and `workers` worker processes until interrupted. Workers that die are replaced
+    and their jobs requeued; jobs left running by a previous service are requeued at startup.
+    """
+    queue = JobQueue(path)
+    requeued = queue.requeue()
+    if requeued:
+        print(f"Requeued {requeued} jobs interrupted by the previous shutdown.")
+    # Spawned, not forked: the parent runs HTTP threads
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    processes = {}
+
+    def start_worker(slot: int):
+        process = context.Process(target=worker_loop, args=(path, stop), name=f"job-worker-{slot}", daemon=True)
+        process.start()
+        processes[slot] = process
+
+    for slot in range(max(1, workers)):
+        start_worker(slot)
+    server = ThreadingHTTPServer((host, port), make_handler(queue))
+    threading.Thread(target=server.serve_forever, name="job-api", daemon=True).start()
+    print(f"Job service listening on http://{host}:{port} with {len(processes)} workers (queue: {path}).")
+    try:
+        while True:
+            time.sleep(POLL_SECONDS)
+            for slot, process in list(processes.items()):
+                if not process.is_alive():
+                    requeued = queue.requeue(process.pid)
+                    print(f"Worker {slot} exited (code {process.exitcode}); {requeued} jobs requeued.")
+                    start_worker(slot)
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    finally:
+        server.shutdown()
+        stop.set()
+        for process in processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        # Jobs cut short resume from their manifest when the service starts again
+        queue.requeue()
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Video Summarizer - job service")
+    parser.add_argument("--db", default=JOB_SERVICE_DB, help=f"Queue database (default: {JOB_SERVICE_DB})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the HTTP API and the worker processes")
+    serve_parser.add_argument("--workers", type=int, default=JOB_SERVICE_WORKERS, help=f"Worker processes, each running one job at a time (default: {JOB_SERVICE_WORKERS})")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address the HTTP API listens on (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=JOB_SERVICE_PORT, help=f"HTTP API port (default: {JOB_SERVICE_PORT})")
+
+    submit_parser = commands.add_parser("submit", help="Queue a video")
+    submit_parser.add_argument("input", help="YouTube URL or local video file path")
+    submit_parser.add_argument("--priority", type=int, default=0, help="Higher priorities run first (default: 0)")
+    submit_parser.add_argument("--force", action="store_true", help="Process the video again even if it was already processed with the same options")
+    add_processing_arguments(submit_parser)
+
+    status_parser = commands.add_parser("status", help="Show a job's status")
+    status_parser.add_argument("id")
+    result_parser = commands.add_parser("result", help="Print a finished job's result as JSON")
+    result_parser.add_argument("id")
+    list_parser = commands.add_parser("list", help="List recent jobs")
+    list_parser.add_argument("--status", choices=STATUSES)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.command == "serve":
+        try:
+            require_openai_api_key()
+        except ValueError as e:
+            parser.error(str(e))
+        serve(args.workers, args.host, args.port, args.db)
+    elif args.command == "submit":
+        options = {name: getattr(args, name) for name in default_options()}
+        job_id, created = queue.submit(args.input, options, args.priority, args.force)
+        print(job_id if created else f"{job_id} (already {queue.get(job_id)['status']})")
+    elif args.command in ("status", "result"):
+        job = queue.get(args.id)
+        if job is None:
+            parser.exit(1, f"Job {args.id} not found.\n")
+        if args.command == "status":
+            print(json.dumps(job_status(job), ensure_ascii=False, indent=2))
+        elif job["status"] != "done":
+            parser.exit(1, f"Job {args.id} is {job['status']}.\n")
+        else:
+            print(json.dumps(job["result"], ensure_ascii=False, indent=2))
+    else:
+        for job in queue.list_jobs(args.status):
+            print(f"{job['id']}  {job['status']:<8} {job['progress']:>4.0%}  p{job['priority']}  {job['input']}")
+
+if __name__ == "__main__":
+    main()
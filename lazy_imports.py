@@ -0,0 +1,24 @@
+import importlib
+import sys
+
+class LazyModule:
+    """
+    Stands in for a heavy module (openai, yt_dlp, ffmpeg) until one of its attributes is used,
+    and only then imports it, so commands that never need it (--help, argument errors) start fast.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Only called for attributes the proxy doesn't have; import_module is thread-safe and cached
+        return getattr(importlib.import_module(self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+def lazy_import(name: str):
+    """
+    Returns the module if it is already imported, otherwise a LazyModule that imports it on first use.
+    """
+    return sys.modules.get(name) or LazyModule(name)
@@ -1,171 +1,515 @@
 import argparse
 import os
-from audio_extractor import download_youtube_audio, extract_audio_from_video
-from audio_chunker import partition_audio_equal, partition_audio_by_timestamps
+import shutil
+import sqlite3
+from audio_extractor import download_youtube_audio, extract_audio_from_video, compress_audio, to_processed_time, to_original_time
+from audio_chunker import partition_audio_equal, partition_audio_by_timestamps, fits_in_single_upload, release_chunk, is_memory_chunk
 from transcription import transcribe_audio
-from summarization import generate_summary
-from youtube_processor import get_video_description, extract_timestamps_from_description
+from chunk_processor import transcribe_concurrently, run_as_they_arrive
+from summary_planner import plan_summarization, format_plan, run_summarization_plan, summarize_text, reduce_summaries
+from streaming import fetch_youtube_info, stream_audio_chunks
+from chapters import transcribe_with_timestamps, assign_segments_to_chapters
+from config import MAX_WORKERS, YOUTUBE_AUDIO_FORMAT, IN_MEMORY_CHUNKS, require_openai_api_key
+from cache import result_cache
+from instrumentation import RunReport, notify, text_listener
+from job_manifest import JobManifest, input_key, job_workspace, output_name, section_keys
+from search_index import index_job
+from youtube_processor import get_video_timestamps
 from utils import save_markdown, clean_filename, get_audio_duration
 
-# Set a threshold duration in seconds for "short" videos (e.g., 10 minutes)
-SHORT_DURATION_THRESHOLD = 30 * 60  # 30 minutes
+# Share of a job done once its audio is transcribed, and once its sections are summarized (see notify)
+TRANSCRIBED = 0.6
+SUMMARIZED = 0.95
 
-def process_short_audio(audio_path: str, output_prefix: str):
+def transcribe_sections(chunk_files: list, section_names: list, output_prefix: str, max_workers: int = MAX_WORKERS, manifest: JobManifest = None) -> tuple[list, float]:
+    """
+    Transcribes the chunks (files or memory chunks) concurrently, saving each transcript as
+    {output_prefix}_{section_key}_transcript.md (see section_keys) and deleting the chunk file. Sections the manifest already has from a previous run are not transcribed again.
+    Returns (transcripts, total_cost) in section order.
+    """
+    transcripts = [None] * len(chunk_files)
+    keys = section_keys(section_names)
+    total_cost = 0.0
+    pending = []
+    for i, key in enumerate(keys):
+        done = manifest.load_transcript(key) if manifest else None
+        if done is None:
+            pending.append(i)
+        else:
+            transcripts[i], cost = done
+            total_cost += cost
+    if len(pending) < len(chunk_files):
+        notify(f"Resuming: {len(chunk_files) - len(pending)} of {len(chunk_files)} sections already transcribed.")
+    done_count = [len(chunk_files) - len(pending)]
+
+    def on_chunk_done(j, result):
+        i = pending[j]
+        done_count[0] += 1
+        transcript, cost = result
+        transcript_file = f"{output_prefix}_{keys[i]}_transcript.md"
+        save_markdown(transcript_file, transcript)
+        if manifest:
+            manifest.update_section(keys[i], transcript=transcript_file, transcript_cost=cost)
+        release_chunk(chunk_files[i])
+        notify(f"Section {section_names[i]} transcribed.", TRANSCRIBED * done_count[0] / len(chunk_files))
+
+    if pending:
+        notify(f"Transcribing {len(pending)} sections with up to {max_workers} workers...")
+    results = transcribe_concurrently([chunk_files[i] for i in pending], max_workers, on_chunk_done)
+    for i, (transcript, cost) in zip(pending, results):
+        transcripts[i] = transcript
+        total_cost += cost
+    return transcripts, total_cost
+
+def summarize_sections(transcripts: list, section_names: list, output_prefix: str, labels: list = None, max_workers: int = MAX_WORKERS, manifest: JobManifest = None, spans: list = None) -> tuple[str, str, float, list]:
+    """
+    Plans and runs the token-budgeted map-reduce summarization of the section transcripts.
+    Saves each section summary as {output_prefix}_{section_key}_summary.md (see section_keys), then the merged transcript,
+    merged summary and final summary. Section summaries the manifest already has are reused.
+    `spans` gives the (start, end) of every section in seconds (see section_spans).
+    Returns (merged_transcript, final_summary, total_summary_cost, sections), sections as in flow_result.
+    """
+    plan = plan_summarization(transcripts, labels)
+    notify(format_plan(plan))
+
+    completed = {}
+    resumed_cost = 0.0
+    keys = section_keys(section_names)
+    for i, key in enumerate(keys):
+        done = manifest.load_summary(key) if manifest else None
+        if done is not None:
+            completed[i], cost = done
+            resumed_cost += cost
+    if completed:
+        notify(f"Resuming: {len(completed)} of {len(section_names)} sections already summarized.")
+    summarized_count = [len(completed)]
+
+    def on_section_summarized(i, summary, cost):
+        summarized_count[0] += 1
+        summary_file = f"{output_prefix}_{keys[i]}_summary.md"
+        save_markdown(summary_file, summary)
+        if manifest:
+            manifest.update_section(keys[i], summary=summary_file, summary_cost=cost)
+        fraction = TRANSCRIBED + (SUMMARIZED - TRANSCRIBED) * summarized_count[0] / len(section_names)
+        notify(f"Section {section_names[i]} summarized.", fraction)
+
+    section_summaries, final_summary, total_summary_cost = run_summarization_plan(plan, max_workers, on_section_summarized, completed)
+    total_summary_cost += resumed_cost
+
+    if labels:
+        merged_transcript = "\n\n".join(f"## {label}\n\n{t}" for label, t in zip(labels, transcripts))
+        merged_summary = "\n\n".join(f"## {label}\n\n{s}" for label, s in zip(labels, section_summaries))
+    else:
+        merged_transcript = "\n\n".join(transcripts)
+        merged_summary = "\n\n".join(section_summaries)
+
+    save_markdown(f"{output_prefix}_merged_transcript.md", merged_transcript)
+    save_markdown(f"{output_prefix}_merged_summary.md", merged_summary)
+    save_markdown(f"{output_prefix}_final_summary.md", final_summary)
+    spans = spans or [(None, None)] * len(transcripts)
+    sections = [
+        {"label": label, "start": start, "end": end, "transcript": transcript, "summary": summary}
+        for label, (start, end), transcript, summary in zip(labels or [None] * len(transcripts), spans, transcripts, section_summaries)
+    ]
+    return merged_transcript, final_summary, total_summary_cost, sections
+
+def print_costs(transcript_cost: float, summary_cost: float):
+    notify(
+        f"\nCosts:\n• Transcription: ${transcript_cost:.4f}\n• Summary: ${summary_cost:.4f}\n"
+        f"• Total: ${transcript_cost + summary_cost:.4f}\n"
+    )
+
+def flow_result(transcript: str, summary: str, transcript_cost: float, summary_cost: float, sections: list = None, segments: list = None) -> dict:
+    """
+    What every process_* flow returns: the (merged) transcript, the final summary and their costs.
+    `sections` lists the sections as dicts with "label", "start", "end" (seconds of the original audio,
+    None when unknown), "transcript" and "summary"; `segments` the timestamped Whisper segments, when the
+    flow has them. Both are used by the search index.
+    """
+    return {
+        "transcript": transcript, "summary": summary, "transcript_cost": transcript_cost, "summary_cost": summary_cost,
+        "sections": sections or [], "segments": segments or [],
+    }
+
+def section_spans(chunks: list, options: dict, manifest: JobManifest = None, first_start: float = 0.0, time_map: dict = None) -> list:
+    """
+    Returns the (start, end) of every chunk in seconds of the original audio. Chunks are consecutive from
+    first_start; file chunks are measured while they exist, and the spans are kept in the manifest for
+    runs that resume after transcribed chunks were deleted.
+    """
+    done = manifest.step("spans", options=options) if manifest else None
+    if done is not None and len(done["spans"]) == len(chunks):
+        return [tuple(span) for span in done["spans"]]
+    spans = []
+    position = first_start
+    for chunk in chunks:
+        if is_memory_chunk(chunk):
+            position, duration = chunk["start"], chunk["duration"]
+        else:
+            duration = get_audio_duration(chunk)
+        spans.append((to_original_time(position, time_map), to_original_time(position + duration, time_map)))
+        position += duration
+    if manifest:
+        manifest.complete_step("spans", options=options, spans=spans)
+    return spans
+
+def process_short_audio(audio_path: str, output_prefix: str, max_workers: int = MAX_WORKERS, manifest: JobManifest = None, duration: float = None, time_map: dict = None):
     """
     Processes short audio files: transcribes the whole audio, generates a summary, and saves the results.
+    Transcripts over the summary token budget are summarized in pieces and reduced.
+    `duration` (of audio_path) ends the single section, so its passages can be placed in time.
     """
-    print("Processing short audio file...")
+    notify("Processing short audio file...")
     
-    transcript, transcript_cost = transcribe_audio(audio_path)
-    summary, summary_cost = generate_summary(transcript)
+    done = manifest.load_transcript("full") if manifest else None
+    if done is not None:
+        notify("Resuming: audio already transcribed.")
+        transcript, transcript_cost = done
+    else:
+        transcript, transcript_cost = transcribe_audio(audio_path)
+        save_markdown(f"{output_prefix}_transcript.md", transcript)
+        if manifest:
+            manifest.update_section("full", transcript=f"{output_prefix}_transcript.md", transcript_cost=transcript_cost)
+    notify("Audio transcribed.", TRANSCRIBED)
+    plan = plan_summarization([transcript])
+    notify(format_plan(plan))
+    _, summary, summary_cost = run_summarization_plan(plan, max_workers)
     
-    save_markdown(f"{output_prefix}_transcript.md", transcript)
     save_markdown(f"{output_prefix}_summary.md", summary)
     
-    print("\nCosts:")
-    print(f"• Transcription: ${transcript_cost:.4f}")
-    print(f"• Summary: ${summary_cost:.4f}")
-    print(f"• Total: ${transcript_cost + summary_cost:.4f}\n")
-    print("Transcription and summary saved.")
+    print_costs(transcript_cost, summary_cost)
+    notify("Transcription and summary saved.")
+    end = to_original_time(duration, time_map) if duration else None
+    sections = [{"label": None, "start": 0.0, "end": end, "transcript": transcript, "summary": summary}]
+    return flow_result(transcript, summary, transcript_cost, summary_cost, sections)
 
-def process_long_audio_equal(audio_path: str, output_prefix: str, num_chunks: int = 4):
+def process_long_audio_equal(audio_path: str, output_prefix: str, num_chunks: int = None, max_workers: int = MAX_WORKERS, manifest: JobManifest = None, in_memory_chunks: bool = IN_MEMORY_CHUNKS, time_map: dict = None):
     """
     Processes long audio files by equal partitioning.
-    Transcribes and summarizes each chunk, then merges the results.
+    Transcribes the chunks concurrently, then summarizes them with a token-budgeted map-reduce in chunk order.
+    With a manifest, a re-run resumes from the first chunk that was not transcribed or summarized.
+    With in_memory_chunks, chunks are cut into memory by the workers that upload them instead of to files.
+    `time_map` maps the section times of audio preprocessed by compress_audio back to the original timeline.
     """
-    print("Processing long audio file with equal partitioning...")
-    total_transcript_cost = 0.0
-    total_summary_cost = 0.0
+    notify("Processing long audio file with equal partitioning...")
 
-    chunk_files = partition_audio_equal(audio_path, num_chunks)
-    chunk_transcripts = []
-    chunk_summaries = []
+    def cut():
+        chunk_files = partition_audio_equal(audio_path, num_chunks, in_memory=in_memory_chunks)
+        return [(chunk_file, f"chunk_{i}") for i, chunk_file in enumerate(chunk_files)]
 
-    for i, chunk in enumerate(chunk_files):
-        print(f"Transcribing chunk {i}...")
-        transcript, chunk_trans_cost = transcribe_audio(chunk)
-        total_transcript_cost += chunk_trans_cost
-        chunk_transcripts.append(transcript)
-        save_markdown(f"{output_prefix}_chunk_{i}_transcript.md", transcript)
+    options = {"method": "equal", "audio": audio_path, "num_chunks": num_chunks, "in_memory": in_memory_chunks, "time_map": time_map or {}}
+    chunks = manifest.resume_chunks(options, cut) if manifest else cut()
+    chunk_files = [chunk_file for chunk_file, _ in chunks]
+    section_names = [name for _, name in chunks]
+    spans = section_spans(chunk_files, options, manifest, time_map=time_map)
 
-        print(f"Summarizing chunk {i}...")
-        summary, chunk_sum_cost = generate_summary(transcript)
-        total_summary_cost += chunk_sum_cost
-        chunk_summaries.append(summary)
-        save_markdown(f"{output_prefix}_chunk_{i}_summary.md", summary)
+    chunk_transcripts, total_transcript_cost = transcribe_sections(chunk_files, section_names, output_prefix, max_workers, manifest)
+    merged_transcript, final_summary, total_summary_cost, sections = summarize_sections(
+        chunk_transcripts, section_names, output_prefix, max_workers=max_workers, manifest=manifest, spans=spans
+    )
 
-        os.remove(chunk)
+    print_costs(total_transcript_cost, total_summary_cost)
+    notify("Merged transcription and summaries saved.")
+    return flow_result(merged_transcript, final_summary, total_transcript_cost, total_summary_cost, sections)
 
-    merged_transcript = "\n\n".join(chunk_transcripts)
-    merged_summary = "\n\n".join(chunk_summaries)
-    final_summary, final_sum_cost = generate_summary(merged_summary)
-    total_summary_cost += final_sum_cost
+def process_long_audio_timestamps(audio_path: str, output_prefix: str, timestamps: list, max_workers: int = MAX_WORKERS, time_map: dict = None, manifest: JobManifest = None, in_memory_chunks: bool = IN_MEMORY_CHUNKS):
+    """
+    Processes long audio files using timestamp-based partitioning (used for YouTube videos).
+    `timestamps` is a list of tuples (start_time_in_seconds, label) from the video's chapters or description.
+    Partitions the audio accordingly, transcribes the sections concurrently, then summarizes them with a
+    token-budgeted map-reduce.
+    `time_map` maps the timestamps onto audio preprocessed by compress_audio.
+    """
+    notify("Processing long audio file with timestamp partitioning...")
 
-    save_markdown(f"{output_prefix}_merged_transcript.md", merged_transcript)
-    save_markdown(f"{output_prefix}_merged_summary.md", merged_summary)
-    save_markdown(f"{output_prefix}_final_summary.md", final_summary)
+    if not timestamps:
+        notify("No chapters or timestamps found. Falling back to equal partitioning.")
+        return process_long_audio_equal(audio_path, output_prefix, max_workers=max_workers, manifest=manifest, in_memory_chunks=in_memory_chunks, time_map=time_map)
+    timestamps = [(to_processed_time(start, time_map), label) for start, label in timestamps]
+    options = {"method": "timestamps", "audio": audio_path, "timestamps": timestamps, "in_memory": in_memory_chunks, "time_map": time_map or {}}
+
+    def cut():
+        return partition_audio_by_timestamps(audio_path, timestamps, in_memory=in_memory_chunks)
+
+    chunks = manifest.resume_chunks(options, cut) if manifest else cut()
+    chunk_files = [chunk_file for chunk_file, _ in chunks]
+    labels = [label for _, label in chunks]
+    spans = section_spans(chunk_files, options, manifest, first_start=timestamps[0][0], time_map=time_map)
 
-    print("\nCosts:")
-    print(f"• Transcription: ${total_transcript_cost:.4f}")
-    print(f"• Summary: ${total_summary_cost:.4f}")
-    print(f"• Total: ${total_transcript_cost + total_summary_cost:.4f}\n")
-    print("Merged transcription and summaries saved.")
+    section_transcripts, total_transcript_cost = transcribe_sections(chunk_files, labels, output_prefix, max_workers, manifest)
+    merged_transcript, final_summary, total_summary_cost, sections = summarize_sections(
+        section_transcripts, labels, output_prefix, labels=labels, max_workers=max_workers, manifest=manifest, spans=spans
+    )
 
-def process_long_audio_timestamps(audio_path: str, output_prefix: str, description: str):
+    print_costs(total_transcript_cost, total_summary_cost)
+    notify("Merged transcription and summaries saved.")
+    return flow_result(merged_transcript, final_summary, total_transcript_cost, total_summary_cost, sections)
+
+def process_long_audio_chapters(audio_path: str, output_prefix: str, timestamps: list, num_chunks: int = None, max_workers: int = MAX_WORKERS, time_map: dict = None, manifest: JobManifest = None, in_memory_chunks: bool = IN_MEMORY_CHUNKS):
     """
-    Processes long audio files using timestamp-based partitioning (used for YouTube videos).
-    Extracts timestamps from the description, partitions the audio accordingly, then transcribes and summarizes each section.
+    Processes long audio files chapter by chapter without cutting the audio per chapter (used for YouTube videos).
+    Transcribes the audio once with segment timestamps, assigns the segments to the chapters in `timestamps`
+    (list of tuples (start_time_in_seconds, label)), then summarizes the chapters with a token-budgeted map-reduce.
+    `time_map` maps segment times of audio preprocessed by compress_audio back to the original timeline.
     """
-    print("Processing long audio file with timestamp partitioning...")
-    total_transcript_cost = 0.0
-    total_summary_cost = 0.0
+    notify("Processing long audio file with chapter-aware transcription...")
 
-    timestamps = extract_timestamps_from_description(description)
     if not timestamps:
-        print("No timestamps found in description. Falling back to equal partitioning.")
-        process_long_audio_equal(audio_path, output_prefix)
-        return
-    chunk_info = partition_audio_by_timestamps(audio_path, timestamps)
-    section_transcripts = []
-    section_summaries = []
-
-    for i, (chunk_file, label) in enumerate(chunk_info):
-        print(f"Transcribing section {label}...")
-        transcript, chunk_trans_cost = transcribe_audio(chunk_file)
-        total_transcript_cost += chunk_trans_cost
-        section_transcripts.append(f"## {label}\n\n{transcript}")
-        save_markdown(f"{output_prefix}_{label}_transcript.md", transcript)
-
-        print(f"Summarizing section {label}...")
-        summary, chunk_sum_cost = generate_summary(transcript)
-        total_summary_cost += chunk_sum_cost
-        section_summaries.append(f"## {label}\n\n{summary}")
-        save_markdown(f"{output_prefix}_{label}_summary.md", summary)
-        
+        notify("No chapters or timestamps found. Falling back to equal partitioning.")
+        return process_long_audio_equal(audio_path, output_prefix, max_workers=max_workers, manifest=manifest, in_memory_chunks=in_memory_chunks, time_map=time_map)
+
+    options = {"audio": audio_path, "num_chunks": num_chunks, "time_map": time_map or {}}
+    done = manifest.step("segments", options=options) if manifest else None
+    if done is not None:
+        notify("Resuming: audio already transcribed with segment timestamps.")
+        segments, total_transcript_cost = done["segments"], done["cost"]
+    else:
+        notify("Transcribing with segment timestamps...")
+        segments, total_transcript_cost = transcribe_with_timestamps(audio_path, num_chunks, max_workers, time_map, in_memory_chunks)
+        if manifest:
+            manifest.complete_step("segments", options=options, segments=segments, cost=total_transcript_cost)
+    notify("Audio transcribed.", TRANSCRIBED)
+    # A chapter runs until the next one starts (the last one until the end of the speech)
+    starts = sorted(start for start, _ in timestamps)
+    ends = starts[1:] + [segments[-1]["end"] if segments else None]
+    chapters = [
+        (label, text, span)
+        for (label, text), span in zip(assign_segments_to_chapters(segments, timestamps), zip(starts, ends))
+        if text
+    ]
+    labels = [label for label, _, _ in chapters]
+    section_transcripts = [text for _, text, _ in chapters]
+    for key, (_, transcript, _) in zip(section_keys(labels), chapters):
+        save_markdown(f"{output_prefix}_{key}_transcript.md", transcript)
+
+    merged_transcript, final_summary, total_summary_cost, sections = summarize_sections(
+        section_transcripts, labels, output_prefix, labels=labels, max_workers=max_workers, manifest=manifest,
+        spans=[span for _, _, span in chapters]
+    )
+
+    print_costs(total_transcript_cost, total_summary_cost)
+    notify("Merged transcription and summaries saved.")
+    return flow_result(merged_transcript, final_summary, total_transcript_cost, total_summary_cost, sections, segments)
+
+def process_youtube_streaming(info_path: str, work_dir: str, output_prefix: str, max_workers: int = MAX_WORKERS):
+    """
+    Processes a YouTube video while it downloads: every chunk is transcribed and summarized as soon as
+    ffmpeg finishes cutting it, and the chunk summaries are reduced into the final summary at the end.
+    `info_path` is the info JSON saved by fetch_youtube_info.
+    """
+    notify("Processing YouTube audio while it downloads...")
+
+    def process_chunk(chunk):
+        i, chunk_file, start, end = chunk
+        transcript, transcript_cost = transcribe_audio(chunk_file)
+        piece_summaries, summary_cost = summarize_text(transcript, label=f"chunk {i}")
         os.remove(chunk_file)
+        return transcript, transcript_cost, piece_summaries, summary_cost, (start, end)
+
+    def on_chunk_done(i, result):
+        transcript, _, piece_summaries, _, _ = result
+        save_markdown(f"{output_prefix}_chunk_{i}_transcript.md", transcript)
+        save_markdown(f"{output_prefix}_chunk_{i}_summary.md", "\n\n".join(piece_summaries))
+        notify(f"Chunk {i} transcribed and summarized.")
+
+    results = run_as_they_arrive(process_chunk, stream_audio_chunks(info_path, work_dir), max_workers, on_chunk_done)
+    if not results:
+        raise RuntimeError("The stream produced no audio.")
+    chunk_transcripts = [transcript for transcript, _, _, _, _ in results]
+    chunk_summaries = ["\n\n".join(piece_summaries) for _, _, piece_summaries, _, _ in results]
+    total_transcript_cost = sum(cost for _, cost, _, _, _ in results)
+    total_summary_cost = sum(cost for _, _, _, cost, _ in results)
+    sections = [
+        {"label": None, "start": start, "end": end, "transcript": transcript, "summary": "\n\n".join(pieces)}
+        for transcript, _, pieces, _, (start, end) in results
+    ]
 
-    merged_transcript = "\n\n".join(section_transcripts)
-    merged_summary = "\n\n".join(section_summaries)
-    final_summary, final_sum_cost = generate_summary(merged_summary)
-    total_summary_cost += final_sum_cost
+    piece_summaries = [summary for _, _, pieces, _, _ in results for summary in pieces]
+    if len(piece_summaries) == 1:
+        final_summary = piece_summaries[0]
+    else:
+        notify(f"Reducing {len(piece_summaries)} chunk summaries...")
+        final_summary, reduce_cost = reduce_summaries(piece_summaries, max_workers=max_workers)
+        total_summary_cost += reduce_cost
 
+    merged_transcript = "\n\n".join(chunk_transcripts)
     save_markdown(f"{output_prefix}_merged_transcript.md", merged_transcript)
-    save_markdown(f"{output_prefix}_merged_summary.md", merged_summary)
+    save_markdown(f"{output_prefix}_merged_summary.md", "\n\n".join(chunk_summaries))
     save_markdown(f"{output_prefix}_final_summary.md", final_summary)
 
-    print("\nCosts:")
-    print(f"• Transcription: ${total_transcript_cost:.4f}")
-    print(f"• Summary: ${total_summary_cost:.4f}")
-    print(f"• Total: ${total_transcript_cost + total_summary_cost:.4f}\n")
-    print("Merged transcription and summaries saved.")
+    print_costs(total_transcript_cost, total_summary_cost)
+    notify("Merged transcription and summaries saved.")
+    return flow_result(merged_transcript, final_summary, total_transcript_cost, total_summary_cost, sections)
 
-def main():
-    parser = argparse.ArgumentParser(description="AI Video Summarizer")
-    parser.add_argument("--input", required=True, help="YouTube URL or local video file path")
-    parser.add_argument("--partition", choices=["equal", "timestamps"], help="Partitioning method for long videos. (timestamps only works for YouTube if timestamps exist)")
-    args = parser.parse_args()
+def tempo_factor(value: str) -> float:
+    """
+    argparse type for --tempo: a speed-up factor of at least 1.
+    """
+    try:
+        tempo = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid tempo: {value!r}")
+    if not tempo >= 1.0:
+        raise argparse.ArgumentTypeError(f"tempo must be at least 1 (got {value})")
+    return tempo
 
-    input_source = args.input
+def add_processing_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the options shared by every entry point that processes videos.
+    """
+    parser.add_argument("--partition", choices=["equal", "timestamps", "chapters"], help="Partitioning method for long videos. (timestamps and chapters only work for YouTube if timestamps exist)")
+    parser.add_argument("--chunks", type=int, help="Minimum number of chunks for long audio. By default, the fewest chunks that fit the Whisper upload limit; more chunks are cut at pauses and processed in parallel")
+    parser.add_argument("--trim-silence", action="store_true", help="Shorten long pauses before transcription to reduce Whisper minutes")
+    parser.add_argument("--tempo", type=tempo_factor, default=1.0, help="Speed the audio up by this factor (at least 1) before transcription (e.g. 1.25)")
+    parser.add_argument("--youtube-format", choices=["native", "opus", "mp3"], default=YOUTUBE_AUDIO_FORMAT, help=f"How YouTube audio is ingested: keep the published stream, transcode once to compact Opus, or to MP3 (default: {YOUTUBE_AUDIO_FORMAT})")
+    parser.add_argument("--stream", action="store_true", help="YouTube only: transcribe and summarize chunks while the audio is still downloading (equal-length chunks; ignores --partition, --trim-silence and --tempo)")
+    parser.add_argument("--in-memory-chunks", action="store_true", default=IN_MEMORY_CHUNKS, help="Cut chunks with FFmpeg straight into memory and upload them from there, without temporary chunk files (default: IN_MEMORY_CHUNKS from the environment)")
+    parser.add_argument("--profile", action="store_true", help="Print where the run spent its time, per stage (download, ffmpeg, Whisper, GPT-4o, ...)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"Maximum number of chunks processed concurrently (default: {MAX_WORKERS})")
+
+def process_input(input_source: str, args: argparse.Namespace, output_dir: str = "transcription_and_summaries") -> str:
+    """
+    Runs the whole pipeline for one YouTube URL or local video file, with the options from add_processing_arguments.
+    Every input works in its own workspace under temp_media/, so several jobs can run at the same time.
+    The workspace and its manifest are kept when the job fails, so running the same input again resumes it.
+    Returns the output prefix of the saved files, or None on failure.
+    """
+    result = run_pipeline(input_source, args, output_dir)
+    return result["output_prefix"] if result else None
 
-    temp_media_dir = "temp_media"
-    os.makedirs(temp_media_dir, exist_ok=True)
-    audio_file = os.path.join(temp_media_dir, "output.mp3")
+def run_pipeline(input_source: str, args: argparse.Namespace, output_dir: str = "transcription_and_summaries", job_key: str = None) -> dict:
+    """
+    Same as process_input, but returns the result of the flow (see flow_result) plus its "title" and
+    "output_prefix" (see job_manifest.output_name), or None on failure. Progress is reported through notify, so a UI can follow it with a progress_listener.
+    `job_key` names the workspace instead of input_key(input_source), e.g. for uploads saved under a new path.
+    """
+    key = job_key or input_key(input_source)
+    work_dir = job_workspace(key)
+    os.makedirs(work_dir, exist_ok=True)
+    result = None
+    try:
+        result = _process_input(input_source, args, output_dir, work_dir, key)
+        if result is not None:
+            try:
+                notify(f"Indexed {index_job(key, input_source, result)} passages for search.")
+            except sqlite3.Error as e:
+                # The results are saved either way; the search index just misses this video
+                notify(f"Failed to update the search index: {e}")
+        return result
+    finally:
+        # Streamed jobs can't be resumed, so their workspace is always removed
+        if result is not None or args.stream:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            notify(f"Progress saved in {work_dir}. Run the same input again to resume.")
 
-    output_dir = "transcription_and_summaries"
+def _process_input(input_source: str, args: argparse.Namespace, output_dir: str, work_dir: str, key: str) -> dict:
+    audio_file = os.path.join(work_dir, "output.mp3")
     os.makedirs(output_dir, exist_ok=True)
+    manifest = JobManifest(work_dir)
+
+    if input_source.startswith("http") and args.stream:
+        notify("Processing YouTube URL...")
+        info_path = os.path.join(work_dir, "info.json")
+        try:
+            video_info = fetch_youtube_info(input_source, info_path)
+            title = clean_filename(video_info["title"])
+            output_prefix = os.path.join(output_dir, output_name(title, key))
+            result = process_youtube_streaming(info_path, work_dir, output_prefix, max_workers=args.workers)
+        except Exception as e:
+            notify(f"Failed to process the YouTube stream: {e}")
+            return None
+        return {**result, "title": title, "output_prefix": output_prefix}
 
-    if input_source.startswith("http"):
-        print("Processing YouTube URL...")
-        success, video_title = download_youtube_audio(input_source, audio_file)
+    audio_step = manifest.step("audio", youtube_format=args.youtube_format)
+    if audio_step is not None and os.path.exists(audio_step["path"]):
+        notify("Resuming: reusing the audio from the previous run.")
+        audio_file = audio_step["path"]
+        video_info = audio_step["video_info"]
+        timestamps = get_video_timestamps(video_info) if video_info else []
+        base_name = audio_step["base_name"]
+    elif input_source.startswith("http"):
+        notify("Processing YouTube URL...")
+        success, video_info, audio_file = download_youtube_audio(input_source, audio_file, args.youtube_format)
         if not success:
-            print("Failed to download YouTube audio.")
-            return
-        description = get_video_description(input_source)
-        base_name = clean_filename(video_title)
+            notify("Failed to download YouTube audio.")
+            return None
+        timestamps = get_video_timestamps(video_info)
+        base_name = clean_filename(video_info["title"])
+        manifest.complete_step("audio", youtube_format=args.youtube_format, path=audio_file, video_info=video_info, base_name=base_name)
     else:
-        print("Processing local video file...")
+        notify("Processing local video file...")
         if not extract_audio_from_video(input_source, audio_file):
-            print("Failed to extract audio from local video.")
-            return
-        description = ""
+            notify("Failed to extract audio from local video.")
+            return None
+        timestamps = []
         base_name = os.path.splitext(os.path.basename(input_source))[0]
         base_name = clean_filename(base_name)
+        manifest.complete_step("audio", youtube_format=args.youtube_format, path=audio_file, video_info=None, base_name=base_name)
+    notify("Audio ready.", 0.05)
 
-    output_prefix = os.path.join(output_dir, base_name)
+    output_prefix = os.path.join(output_dir, output_name(base_name, key))
+
+    time_map = {}
+    if args.trim_silence or args.tempo != 1.0:
+        compressed_step = manifest.step("compressed", tempo=args.tempo, trim_silence=args.trim_silence)
+        if compressed_step is not None and os.path.exists(compressed_step["path"]):
+            notify("Resuming: reusing the compressed audio from the previous run.")
+            audio_file, time_map = compressed_step["path"], compressed_step["time_map"]
+        else:
+            notify("Compressing audio before transcription...")
+            # Named after its options, so audio compressed with other options is never mistaken for it
+            compressed_file = os.path.join(work_dir, f"output_compressed_{args.tempo:g}x{'_trimmed' if args.trim_silence else ''}.mp3")
+            # The original audio is kept until the job succeeds, so it can be compressed again with other options
+            success, time_map = compress_audio(audio_file, compressed_file, tempo=args.tempo, trim_silence=args.trim_silence)
+            if success:
+                audio_file = compressed_file
+                manifest.complete_step("compressed", tempo=args.tempo, trim_silence=args.trim_silence, path=audio_file, time_map=time_map)
+            else:
+                notify("Failed to compress audio. Using the original audio.")
+
+    # Sections transcribed or summarized from other audio (e.g. before --tempo changed) are not reused
+    if manifest.step("source", audio=audio_file, time_map=time_map) is None:
+        manifest.reset_sections()
+        manifest.complete_step("source", audio=audio_file, time_map=time_map)
 
     duration = get_audio_duration(audio_file)
-    print(f"Audio duration: {duration:.2f} seconds.")
+    notify(f"Audio duration: {duration:.2f} seconds.")
 
-    if duration <= SHORT_DURATION_THRESHOLD:
-        process_short_audio(audio_file, output_prefix)
+    # Audio that fits in a single Whisper upload is processed in one shot
+    if fits_in_single_upload(audio_file):
+        result = process_short_audio(audio_file, output_prefix, max_workers=args.workers, manifest=manifest, duration=duration, time_map=time_map)
     else:
         if input_source.startswith("http") and args.partition == "timestamps":
-            process_long_audio_timestamps(audio_file, output_prefix, description)
+            result = process_long_audio_timestamps(audio_file, output_prefix, timestamps, max_workers=args.workers, time_map=time_map, manifest=manifest, in_memory_chunks=args.in_memory_chunks)
+        elif input_source.startswith("http") and args.partition == "chapters":
+            result = process_long_audio_chapters(audio_file, output_prefix, timestamps, num_chunks=args.chunks, max_workers=args.workers, time_map=time_map, manifest=manifest, in_memory_chunks=args.in_memory_chunks)
         else:
-            process_long_audio_equal(audio_file, output_prefix)
+            result = process_long_audio_equal(audio_file, output_prefix, num_chunks=args.chunks, max_workers=args.workers, manifest=manifest, in_memory_chunks=args.in_memory_chunks, time_map=time_map)
+    return {**result, "title": base_name, "output_prefix": output_prefix}
 
-    if os.path.exists(audio_file):
-        os.remove(audio_file)
+def main():
+    parser = argparse.ArgumentParser(description="AI Video Summarizer")
+    parser.add_argument("--input", required=True, help="YouTube URL or local video file path")
+    add_processing_arguments(parser)
+    args = parser.parse_args()
+    try:
+        require_openai_api_key()
+    except ValueError as e:
+        parser.error(str(e))
+
+    # The final summary is printed while it is generated
+    with RunReport(args.input) as report, text_listener(lambda delta: print(delta, end="", flush=True)):
+        output_prefix = process_input(args.input, args)
+    report_path = f"{output_prefix}_run_report.json" if output_prefix else os.path.join("transcription_and_summaries", "failed_run_report.json")
+    report.save(report_path)
+    print(f"Run report saved to {report_path}.")
+    if args.profile:
+        print(report.format_profile())
+    if output_prefix is None:
+        return
+    cache_stats = result_cache.stats()
+    print(f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
     print("Processing complete.")
 
 if __name__ == "__main__":
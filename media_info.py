@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+from instrumentation import stage
+from lazy_imports import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Probe results kept in memory, least recently used evicted first
+MAX_ENTRIES = 512
+
+_probes = OrderedDict()
+_durations = OrderedDict()
+_lock = threading.Lock()
+
+def _file_key(path: str) -> tuple:
+    # A rewritten file gets a new size or mtime, so its old probe is never reused
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+def _remember(cache: OrderedDict, key: tuple, value):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > MAX_ENTRIES:
+            cache.popitem(last=False)
+
+def _recall(cache: OrderedDict, key: tuple):
+    with _lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    return None
+
+def probe(path: str) -> dict:
+    """
+    Returns ffmpeg.probe(path), running ffprobe only once per file version: results are memoized by
+    absolute path, size and modification time and shared by every caller in the process.
+    Raises ffmpeg.Error or OSError like ffmpeg.probe.
+    """
+    key = _file_key(path)
+    info = _recall(_probes, key)
+    if info is None:
+        with stage("probe", item=os.path.basename(path)):
+            info = ffmpeg.probe(path)
+        _remember(_probes, key, info)
+    return info
+
+def record_duration(path: str, duration: float):
+    """
+    Records the duration of a file whose length is already known, e.g. a chunk cut from a plan,
+    so get_duration doesn't have to probe it.
+    """
+    try:
+        _remember(_durations, _file_key(path), float(duration))
+    except OSError:
+        pass
+
+def get_duration(path: str) -> float:
+    """
+    Returns the duration of the media file in seconds (0.0 if it can't be probed).
+    """
+    try:
+        key = _file_key(path)
+        duration = _recall(_durations, key)
+        if duration is None:
+            duration = float(probe(path)['format']['duration'])
+            _remember(_durations, key, duration)
+        return duration
+    except Exception as e:
+        print(f"Error getting duration: {e}")
+        return 0.0
+
+def get_bitrate(path: str) -> float:
+    """
+    Returns the encoded bitrate of the media file in bits per second (0.0 if unknown).
+    """
+    try:
+        fmt = probe(path)['format']
+        if fmt.get('bit_rate'):
+            return float(fmt['bit_rate'])
+        return os.path.getsize(path) * 8 / float(fmt['duration'])
+    except (ffmpeg.Error, KeyError, ValueError, ZeroDivisionError, OSError) as e:
+        print(f"Error getting bitrate: {e}")
+        return 0.0
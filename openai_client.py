@@ -0,0 +1,252 @@
+import asyncio
+import contextvars
+import email.utils
+import queue
+import random
+import threading
+import time
+from instrumentation import stage
+from lazy_imports import lazy_import
+from config import (
+    require_openai_api_key, OPENAI_BASE_URL, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE,
+    OPENAI_AUDIO_MINUTES_PER_MINUTE, OPENAI_MAX_RETRIES
+)
+
+openai = lazy_import("openai")  # Imported by the first request
+
+RETRY_BASE_DELAY = 1.0   # seconds, doubled on every attempt
+RETRY_MAX_DELAY = 60.0
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Rate limiter refilled continuously at per_minute units per minute, holding at most one minute of units.
+    A per_minute of 0 disables the limit. Only used from the event loop thread.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        if self.capacity <= 0 or amount <= 0:
+            return
+        # A single request larger than the whole limit still goes through once the bucket is full
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) * 60 / self.capacity)
+
+    def adjust(self, amount: float):
+        """
+        Takes amount more units (or gives them back if negative), e.g. once the real usage of a request is known.
+        """
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+class RequestScheduler:
+    """
+    Sends OpenAI requests once the per-model request bucket, the token bucket and the audio-minute bucket
+    have room, and retries rate limits and transient errors with jittered exponential backoff.
+    A 429 pauses every request until its Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, audio_minutes_per_minute: float, max_retries: int):
+        self.requests_per_minute = requests_per_minute
+        self.request_buckets = {}
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.audio_minutes = TokenBucket(audio_minutes_per_minute)
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.waiting = 0
+        self._resume_at = 0.0
+
+    async def _wait_for_capacity(self, model: str, tokens: float, audio_minutes: float):
+        while (delay := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        bucket = self.request_buckets.setdefault(model, TokenBucket(self.requests_per_minute))
+        await bucket.acquire(1)
+        await self.tokens.acquire(tokens)
+        await self.audio_minutes.acquire(audio_minutes)
+
+    async def run(self, request, model: str, tokens: float = 0, audio_minutes: float = 0):
+        """
+        Awaits request() when there is capacity and returns its result.
+        Reported as an "openai_request" stage, whose wait_seconds is the time spent on rate limits and retries.
+        `tokens` and `audio_minutes` are the estimated usage of the request; the token estimate is corrected
+        with the response's usage when it has one.
+        """
+        with stage("openai_request", model=model) as event:
+            event["wait_seconds"] = 0.0
+            attempt = 0
+            while True:
+                event["attempts"] = attempt + 1
+                wait_start = time.perf_counter()
+                self.waiting += 1
+                try:
+                    await self._wait_for_capacity(model, tokens, audio_minutes)
+                finally:
+                    self.waiting -= 1
+                    event["wait_seconds"] += time.perf_counter() - wait_start
+                self.in_flight += 1
+                try:
+                    response = await request()
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    delay = _retry_delay(e, attempt)
+                    if isinstance(e, openai.RateLimitError):
+                        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    attempt += 1
+                    print(f"OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})...")
+                else:
+                    usage = getattr(response, "usage", None)
+                    if tokens and getattr(usage, "total_tokens", None):
+                        self.tokens.adjust(usage.total_tokens - tokens)
+                    return response
+                finally:
+                    self.in_flight -= 1
+                retry_start = time.perf_counter()
+                await asyncio.sleep(delay)
+                event["wait_seconds"] += time.perf_counter() - retry_start
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.RateLimitError) and getattr(error, "code", None) == "insufficient_quota":
+        return False  # Out of credits: retrying won't help
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, openai.APIConnectionError)
+
+def _retry_after(error: Exception) -> float:
+    """
+    Returns the wait requested by the server's retry-after-ms or Retry-After header, or None.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        # Jitter keeps the waiting requests from all retrying at the same instant
+        return min(retry_after, RETRY_MAX_DELAY) + random.uniform(0, RETRY_BASE_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+_lock = threading.Lock()
+_loop = None
+_client = None
+_scheduler = None
+
+def _start():
+    """
+    Starts the event loop thread that owns the AsyncOpenAI client (and its connection pool) on first use.
+    """
+    global _loop, _client, _scheduler
+    with _lock:
+        if _loop is None:
+            # Retries are handled by the scheduler, so they respect the shared rate limits
+            _client = openai.AsyncOpenAI(api_key=require_openai_api_key(), base_url=OPENAI_BASE_URL, max_retries=0)
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="openai-client", daemon=True).start()
+            _scheduler = RequestScheduler(
+                OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE,
+                OPENAI_AUDIO_MINUTES_PER_MINUTE, OPENAI_MAX_RETRIES
+            )
+            _loop = loop
+    return _loop, _client, _scheduler
+
+def _run_on_loop(coroutine_function):
+    """
+    Schedules coroutine_function(client, scheduler) on the client's event loop and returns its concurrent Future.
+    """
+    loop, client, scheduler = _start()
+    context = contextvars.copy_context()
+
+    async def run():
+        # Tasks start from the loop's context; take the caller's, so stage events name its job
+        for var, value in context.items():
+            var.set(value)
+        return await coroutine_function(client, scheduler)
+
+    return asyncio.run_coroutine_threadsafe(run(), loop)
+
+def _submit(request, model: str, tokens: float, audio_minutes: float):
+    return _run_on_loop(lambda client, scheduler: scheduler.run(lambda: request(client), model, tokens, audio_minutes))
+
+def call_openai(request, model: str, tokens: float = 0, audio_minutes: float = 0):
+    """
+    Runs request(client), a coroutine function taking the shared AsyncOpenAI client, through the rate-limited
+    scheduler and blocks the calling thread until it returns. Safe to call from any number of threads.
+    `tokens` and `audio_minutes` are the estimated usage of the request.
+    """
+    return _submit(request, model, tokens, audio_minutes).result()
+
+_END_OF_STREAM = object()
+
+def stream_openai(request, model: str, tokens: float = 0):
+    """
+    Like call_openai for a request made with stream=True: yields the response chunks in the calling thread
+    as they arrive. Rate limits and retries apply until the stream opens; the token estimate is corrected
+    with the usage chunk (stream_options={"include_usage": True}) when there is one.
+    Stopping the iteration early closes the stream.
+    """
+    chunks = queue.Queue()
+
+    async def read(client, scheduler):
+        try:
+            stream = await scheduler.run(lambda: request(client), model, tokens)
+            async with stream:
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if tokens and getattr(usage, "total_tokens", None):
+                        scheduler.tokens.adjust(usage.total_tokens - tokens)
+                    chunks.put(chunk)
+        except Exception as e:
+            chunks.put(e)
+        else:
+            chunks.put(_END_OF_STREAM)
+
+    future = _run_on_loop(read)
+    try:
+        while (chunk := chunks.get()) is not _END_OF_STREAM:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        future.cancel()
+
+def in_flight_calls() -> int:
+    """
+    Returns the number of OpenAI requests currently being sent or awaiting a response.
+    """
+    return _scheduler.in_flight if _scheduler is not None else 0
+
+def waiting_calls() -> int:
+    """
+    Returns the number of OpenAI requests waiting for rate-limit capacity.
+    """
+    return _scheduler.waiting if _scheduler is not None else 0
@@ -0,0 +1,205 @@
+import argparse
+import bisect
+import os
+import re
+import sqlite3
+import time
+from config import SEARCH_INDEX_PATH
+
+# Transcripts are indexed in passages of about this many words, so a hit points at a moment of the video
+PASSAGE_WORDS = 80
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    input TEXT NOT NULL,
+    title TEXT NOT NULL,
+    output_prefix TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+    text, label, kind UNINDEXED, video_id UNINDEXED, start_ms UNINDEXED, end_ms UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# What a passage is: a piece of a transcript, a section summary, the final summary or a chapter title
+KINDS = ("transcript", "summary", "final_summary", "chapter")
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Background jobs finish on different threads, so every call opens its own connection
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _ms(seconds: float) -> int:
+    return None if seconds is None else int(round(seconds * 1000))
+
+def _text_passages(text: str, start: float, end: float) -> list:
+    """
+    Splits a section transcript into passages of PASSAGE_WORDS words. Without segment timestamps,
+    a passage's time is estimated from its position in the section.
+    """
+    words = text.split()
+    passages = []
+    for i in range(0, len(words), PASSAGE_WORDS):
+        j = min(i + PASSAGE_WORDS, len(words))
+        if start is not None and end is not None:
+            passage_start = start + (end - start) * i / len(words)
+            passage_end = start + (end - start) * j / len(words)
+        else:
+            passage_start, passage_end = start if i == 0 else None, None
+        passages.append((" ".join(words[i:j]), passage_start, passage_end))
+    return passages
+
+def _segment_passages(segments: list, section_starts: list) -> list:
+    """
+    Groups consecutive Whisper segments into passages of about PASSAGE_WORDS words, with exact times.
+    A passage never spans two sections; returns (text, start, end, section_index) tuples.
+    """
+    passages = []
+    current = []
+    words = 0
+    for segment in segments:
+        section = bisect.bisect_right(section_starts, segment["start"]) - 1
+        if current and (words >= PASSAGE_WORDS or section != current[-1][1]):
+            passages.append(current)
+            current, words = [], 0
+        current.append((segment, section))
+        words += len(segment["text"].split())
+    if current:
+        passages.append(current)
+    return [
+        (" ".join(s["text"].strip() for s, _ in group), group[0][0]["start"], group[-1][0]["end"], group[0][1])
+        for group in passages
+    ]
+
+def _rows(result: dict) -> list:
+    """
+    Returns the passages of a pipeline result (see main.flow_result) as (kind, label, text, start, end) tuples.
+    """
+    sections = result.get("sections") or []
+    rows = [("final_summary", None, result["summary"], None, None)]
+    for section in sections:
+        if section["label"] and section["start"] is not None:
+            rows.append(("chapter", section["label"], section["label"], section["start"], section["end"]))
+        if section["summary"]:
+            rows.append(("summary", section["label"], section["summary"], section["start"], section["end"]))
+
+    segments = result.get("segments") or []
+    if segments:
+        timed = [section for section in sections if section["start"] is not None]
+        for text, start, end, index in _segment_passages(segments, [section["start"] for section in timed]):
+            label = timed[index]["label"] if index >= 0 else None
+            rows.append(("transcript", label, text, start, end))
+    elif sections:
+        for section in sections:
+            for text, start, end in _text_passages(section["transcript"], section["start"], section["end"]):
+                rows.append(("transcript", section["label"], text, start, end))
+    else:
+        rows += [("transcript", None, text, start, end) for text, start, end in _text_passages(result["transcript"], None, None)]
+    return [row for row in rows if row[2] and row[2].strip()]
+
+def index_job(key: str, input_source: str, result: dict, path: str = SEARCH_INDEX_PATH) -> int:
+    """
+    Adds a finished job to the search index, replacing what was indexed for the same key (see
+    job_manifest.input_key) before, so every video appears once with its latest results.
+    Returns the number of passages indexed.
+    """
+    title = result.get("title") or input_source
+    rows = _rows(result)
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO videos (key, input, title, output_prefix, indexed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET input = excluded.input, title = excluded.title, "
+                "output_prefix = excluded.output_prefix, indexed_at = excluded.indexed_at",
+                (key, input_source, title, result.get("output_prefix"), time.time()),
+            )
+            video_id = conn.execute("SELECT id FROM videos WHERE key = ?", (key,)).fetchone()["id"]
+            conn.execute("DELETE FROM passages WHERE video_id = ?", (video_id,))
+            conn.executemany(
+                "INSERT INTO passages (text, label, kind, video_id, start_ms, end_ms) VALUES (?, ?, ?, ?, ?, ?)",
+                [(text, label or "", kind, video_id, _ms(start), _ms(end)) for kind, label, text, start, end in rows],
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+def _match_query(query: str) -> str:
+    # Every word must appear; quoting keeps FTS5 operators and punctuation in user input from being parsed
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+
+def search(query: str, limit: int = 20, kinds: tuple = None, path: str = SEARCH_INDEX_PATH) -> list:
+    """
+    Searches the index and returns the best hits first, as dicts with "title", "input", "output_prefix",
+    "kind", "label", "start_ms", "end_ms" (None when unknown), "snippet" (matches in [brackets]) and "score"
+    (BM25, lower is better). Matches in chapter labels weigh more than matches in the text.
+    """
+    match = _match_query(query)
+    if not match or not os.path.exists(path):
+        return []
+    sql = (
+        "SELECT videos.title, videos.input, videos.output_prefix, passages.kind, passages.label, "
+        "passages.start_ms, passages.end_ms, snippet(passages, 0, '[', ']', '...', 16) AS snippet, "
+        "bm25(passages, 1.0, 2.0) AS score "
+        "FROM passages JOIN videos ON videos.id = passages.video_id WHERE passages MATCH ?"
+    )
+    params = [match]
+    if kinds:
+        sql += f" AND passages.kind IN ({', '.join('?' * len(kinds))})"
+        params += list(kinds)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    conn = _connect(path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def format_offset(ms: int) -> str:
+    """
+    Formats a time offset in milliseconds as H:MM:SS (or M:SS).
+    """
+    if ms is None:
+        return "-"
+    minutes, seconds = divmod(ms // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def hit_url(hit: dict) -> str:
+    """
+    Returns a link that opens a YouTube hit at its time offset, or None for local files.
+    """
+    if not hit["input"].startswith("http"):
+        return None
+    if hit["start_ms"] is None:
+        return hit["input"]
+    separator = "&" if "?" in hit["input"] else "?"
+    return f"{hit['input']}{separator}t={hit['start_ms'] // 1000}s"
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the transcripts and summaries of every processed video")
+    parser.add_argument("query", help="Words to search for (all must appear)")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of hits (default: 20)")
+    parser.add_argument("--kind", action="append", choices=KINDS, help="Only search this kind of text (repeatable)")
+    parser.add_argument("--index", default=SEARCH_INDEX_PATH, help=f"Index file (default: {SEARCH_INDEX_PATH})")
+    args = parser.parse_args()
+
+    hits = search(args.query, args.limit, args.kind, args.index)
+    if not hits:
+        print("No results.")
+        return
+    for hit in hits:
+        label = f" · {hit['label']}" if hit["label"] else ""
+        print(f"{hit['title']} [{format_offset(hit['start_ms'])}] ({hit['kind']}{label}) start_ms={hit['start_ms']}")
+        print(f"    {hit['snippet']}")
+        print(f"    {hit_url(hit) or hit['output_prefix']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import media_info
+from audio_chunker import CHUNK_SAMPLE_RATE, CHUNK_CHANNELS, CHUNK_BITRATE, CHUNK_BITRATE_BPS
+from config import STREAM_SEGMENT_SECONDS, WHISPER_MAX_UPLOAD_BYTES, UPLOAD_SAFETY_MARGIN
+from instrumentation import stage, file_size
+from worker_pools import download_slot
+from youtube_processor import extract_video_metadata
+from lazy_imports import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+yt_dlp = lazy_import("yt_dlp")
+
+def fetch_youtube_info(url: str, info_path: str) -> dict:
+    """
+    Extracts the video's info once, saves it to info_path for the streaming downloader
+    (so it does not extract it again) and returns the metadata (see extract_video_metadata).
+    """
+    with yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(ydl.sanitize_info(info), f)
+    return extract_video_metadata(info)
+
+def _read_segment_list(list_path: str) -> list:
+    # The segment muxer appends "name,start,end" once a segment is complete; skip a partly written last line
+    try:
+        with open(list_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in content.splitlines(keepends=True):
+        if not line.endswith("\n"):
+            break
+        name, start, end = line.strip().rsplit(",", 2)
+        entries.append((name, float(start), float(end)))
+    return entries
+
+def stream_audio_chunks(info_path: str, work_dir: str, segment_seconds: float = STREAM_SEGMENT_SECONDS):
+    """
+    Downloads the audio described by info_path and cuts it into 16kHz mono MP3 chunks while it downloads:
+    yt-dlp writes the stream to a pipe read by a single ffmpeg segmenting process.
+    Yields (index, chunk_path, start_in_seconds, end_in_seconds) as soon as each chunk is complete.
+    """
+    max_seconds = WHISPER_MAX_UPLOAD_BYTES * UPLOAD_SAFETY_MARGIN * 8 / CHUNK_BITRATE_BPS
+    segment_seconds = min(segment_seconds, max_seconds)
+    list_path = os.path.join(work_dir, "stream_segments.csv")
+    segment_pattern = os.path.join(work_dir, "stream_%04d.mp3")
+
+    segmenter_args = (
+        ffmpeg.input('pipe:0')
+        .output(
+            segment_pattern,
+            vn=None,
+            ac=CHUNK_CHANNELS,
+            ar=str(CHUNK_SAMPLE_RATE),
+            audio_bitrate=CHUNK_BITRATE,
+            f='segment',
+            segment_time=f"{segment_seconds:.3f}",
+            segment_format='mp3',
+            reset_timestamps=1,
+            segment_list=list_path,
+            segment_list_type='csv',
+            loglevel='error'
+        )
+        .compile()
+    )
+    with download_slot(), stage("stream_download", item=info_path) as event:
+        downloader = subprocess.Popen(
+            [sys.executable, "-m", "yt_dlp", "--quiet", "--no-warnings", "--load-info-json", info_path,
+             "-f", "bestaudio[ext=webm]/bestaudio", "-o", "-"],
+            stdout=subprocess.PIPE
+        )
+        segmenter = subprocess.Popen(segmenter_args, stdin=downloader.stdout)
+        downloader.stdout.close()  # ffmpeg owns the read end now
+        try:
+            emitted = 0
+            while True:
+                finished = segmenter.poll() is not None
+                for name, start, end in _read_segment_list(list_path)[emitted:]:
+                    chunk_path = os.path.join(work_dir, os.path.basename(name))
+                    event["bytes"] = event.get("bytes", 0) + file_size(chunk_path)
+                    event["audio_seconds"] = end
+                    media_info.record_duration(chunk_path, end - start)
+                    yield emitted, chunk_path, start, end
+                    emitted += 1
+                if finished:
+                    break
+                time.sleep(0.5)
+            downloader.wait()
+            if segmenter.returncode != 0 or downloader.returncode != 0:
+                raise RuntimeError(
+                    f"Streaming download failed (yt-dlp exit code {downloader.returncode}, ffmpeg exit code {segmenter.returncode})"
+                )
+        finally:
+            for process in (downloader, segmenter):
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
@@ -1,37 +1,130 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY
-from config import GPT4_INPUT_COST_PER_K, GPT4_OUTPUT_COST_PER_K
+import math
+import time
+from openai_client import call_openai, stream_openai
+from config import GPT4_INPUT_COST_PER_K, GPT4_OUTPUT_COST_PER_K, SUMMARY_EXPECTED_OUTPUT_TOKENS
+from cache import result_cache, make_key
+from instrumentation import stage
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+SUMMARY_MODEL = "gpt-4o"
+SUMMARY_TEMPERATURE = 0
+SUMMARY_PROMPT = (
+    "You are an expert in summarizing video transcripts. "
+    "Read the provided transcript and produce a concise summary capturing the main ideas, key points, and conclusion. "
+    "Use Markdown formatting for headers, bullet lists, and emphasis. "
+    "The transcript can be in Portuguese (Brazilian) or English. Ensure the summary is in the same language as the transcript."
+)
 
-def generate_summary(transcript: str) -> str:
-    """
-    Generates a Markdown summary from the transcript using GPT-4o.
-    """
-    messages = [
+def _messages(transcript: str) -> list:
+    return [
         {
             "role": "system",
-            "content": (
-                "You are an expert in summarizing video transcripts. "
-                "Read the provided transcript and produce a concise summary capturing the main ideas, key points, and conclusion. "
-                "Use Markdown formatting for headers, bullet lists, and emphasis. "
-                "The transcript can be in Portuguese (Brazilian) or English. Ensure the summary is in the same language as the transcript."
-            )
+            "content": SUMMARY_PROMPT
         },
         {
             "role": "user",
             "content": transcript
         }
     ]
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0
-    )
-
-    # Calculate cost
-    input_cost = (response.usage.prompt_tokens / 1000) * GPT4_INPUT_COST_PER_K
-    output_cost = (response.usage.completion_tokens / 1000) * GPT4_OUTPUT_COST_PER_K
-    total_cost = input_cost + output_cost
-    
-    return response.choices[0].message.content, total_cost
+
+def _estimate_tokens(transcript: str) -> int:
+    # ~4 characters per token is enough for rate limiting; the scheduler corrects it with the real usage
+    return math.ceil((len(SUMMARY_PROMPT) + len(transcript)) / 4) + SUMMARY_EXPECTED_OUTPUT_TOKENS
+
+def _cost(usage) -> float:
+    input_cost = (usage.prompt_tokens / 1000) * GPT4_INPUT_COST_PER_K
+    output_cost = (usage.completion_tokens / 1000) * GPT4_OUTPUT_COST_PER_K
+    return input_cost + output_cost
+
+def generate_summary(transcript: str) -> tuple[str, float]:
+    """
+    Generates a Markdown summary from the transcript using GPT-4o.
+    Results are cached by model, prompt and transcript; a cache hit costs nothing.
+    """
+    with stage("summary", model=SUMMARY_MODEL) as event:
+        cache_key = make_key("summary", SUMMARY_MODEL, SUMMARY_TEMPERATURE, SUMMARY_PROMPT, transcript)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            event["cached"] = True
+            return cached["text"], 0.0
+
+        messages = _messages(transcript)
+        response = call_openai(
+            lambda client: client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=messages,
+                temperature=SUMMARY_TEMPERATURE
+            ),
+            model=SUMMARY_MODEL,
+            tokens=_estimate_tokens(transcript)
+        )
+
+        # Calculate cost
+        total_cost = _cost(response.usage)
+        event["input_tokens"] = response.usage.prompt_tokens
+        event["output_tokens"] = response.usage.completion_tokens
+        event["cost"] = total_cost
+
+        summary = response.choices[0].message.content
+        result_cache.put(cache_key, {"text": summary, "cost": total_cost})
+        return summary, total_cost
+
+class SummaryStream:
+    """
+    Streaming variant of generate_summary: iterating over it yields the summary text as GPT-4o generates it.
+    Once the iteration ends, `text` and `cost` hold the whole summary and its cost (from the usage GPT-4o
+    sends last). A cache hit yields the cached summary at once and costs nothing.
+    """
+
+    def __init__(self, transcript: str):
+        self.transcript = transcript
+        self.text = None
+        self.cost = 0.0
+
+    def __iter__(self):
+        with stage("summary", model=SUMMARY_MODEL, streamed=True) as event:
+            cache_key = make_key("summary", SUMMARY_MODEL, SUMMARY_TEMPERATURE, SUMMARY_PROMPT, self.transcript)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                event["cached"] = True
+                self.text = cached["text"]
+                yield self.text
+                return
+
+            messages = _messages(self.transcript)
+            chunks = stream_openai(
+                lambda client: client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=messages,
+                    temperature=SUMMARY_TEMPERATURE,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                model=SUMMARY_MODEL,
+                tokens=_estimate_tokens(self.transcript)
+            )
+            start = time.perf_counter()
+            parts = []
+            usage = None
+            for chunk in chunks:
+                # The last chunk has the usage and no choices
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not parts:
+                        event["first_token_seconds"] = time.perf_counter() - start
+                    parts.append(delta)
+                    yield delta
+
+            self.text = "".join(parts)
+            if usage is not None:
+                self.cost = _cost(usage)
+                event["input_tokens"] = usage.prompt_tokens
+                event["output_tokens"] = usage.completion_tokens
+                event["cost"] = self.cost
+            result_cache.put(cache_key, {"text": self.text, "cost": self.cost})
+
+def generate_summary_stream(transcript: str) -> SummaryStream:
+    """
+    Same as generate_summary, but returns a SummaryStream that yields the text as it is generated.
+    """
+    return SummaryStream(transcript)
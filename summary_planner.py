@@ -0,0 +1,257 @@
+import functools
+import math
+import re
+from chunk_processor import summarize_concurrently
+from config import (
+    MAX_WORKERS, SUMMARY_TOKEN_BUDGET, SUMMARY_FAN_OUT, SUMMARY_EXPECTED_OUTPUT_TOKENS,
+    GPT4_INPUT_COST_PER_K, GPT4_OUTPUT_COST_PER_K, COMPACT_TRANSCRIPTS
+)
+from compaction import compact_transcript
+from summarization import SUMMARY_PROMPT, generate_summary, generate_summary_stream
+from instrumentation import notify, notify_text, stage
+
+# Tokens added to every call by the chat format around the messages
+MESSAGE_OVERHEAD_TOKENS = 12
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding():
+    # Loading tiktoken and its tables is slow, so it waits for the first text to count
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")  # GPT-4o tokenizer
+    except ImportError:
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts GPT-4o tokens in text. Uses tiktoken when installed, otherwise estimates ~4 characters per token.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+@functools.lru_cache(maxsize=None)
+def prompt_tokens() -> int:
+    """
+    Tokens every summary call spends on the prompt and the chat format.
+    """
+    return count_tokens(SUMMARY_PROMPT) + MESSAGE_OVERHEAD_TOKENS
+
+def split_text(text: str, max_tokens: int) -> list:
+    """
+    Splits text into pieces of at most max_tokens tokens, cutting between sentences when possible.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in re.split(r'(?<=[.!?])\s+', text):
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens > max_tokens:
+            # A single "sentence" over budget (e.g. unpunctuated text): cut it by words
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // (2 * sentence_tokens))
+            sub_sentences = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            sub_sentences = [sentence]
+        for sub in sub_sentences:
+            sub_tokens = count_tokens(sub)
+            if current and current_tokens + sub_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(sub)
+            current_tokens += sub_tokens + 1
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def compact_texts(texts: list, labels: list = None) -> tuple[list, int]:
+    """
+    Compacts every transcript with compact_transcript and reports its token savings, per text, to notify
+    and to the run report ("compaction" stage).
+    Returns (compacted_texts, tokens_saved).
+    """
+    labels = labels or [None] * len(texts)
+    compacted = []
+    tokens_saved = 0
+    for i, (text, label) in enumerate(zip(texts, labels)):
+        name = label or f"section {i + 1}"
+        with stage("compaction", item=name) as event:
+            result = compact_transcript(text)
+            before, after = count_tokens(text), count_tokens(result)
+            event["tokens_before"] = before
+            event["tokens_after"] = after
+        if before:
+            notify(f"Compacted {name}: {before} -> {after} tokens (-{(before - after) / before:.1%}).")
+        compacted.append(result)
+        tokens_saved += before - after
+    return compacted, tokens_saved
+
+def budgeted_fan_out(fan_out: int = SUMMARY_FAN_OUT, token_budget: int = SUMMARY_TOKEN_BUDGET) -> int:
+    """
+    Caps fan_out so a reduce call never groups more summaries than the token budget can hold.
+    """
+    max_input_tokens = max(token_budget - prompt_tokens(), 1)
+    return max(2, min(fan_out, max_input_tokens // SUMMARY_EXPECTED_OUTPUT_TOKENS))
+
+def plan_summarization(texts: list, labels: list = None, token_budget: int = SUMMARY_TOKEN_BUDGET, fan_out: int = SUMMARY_FAN_OUT, compact: bool = COMPACT_TRANSCRIPTS) -> dict:
+    """
+    Plans a map-reduce summarization of texts before any API call is made.
+    With `compact`, the texts are compacted first (see compact_texts) and the plan holds the compacted texts.
+    Every text is split into pieces that fit token_budget (map step); the piece summaries are then
+    reduced in a tree where each call combines at most fan_out summaries.
+    `labels` optionally gives a section title per text, kept as a header in the reduce inputs.
+    Returns a plan dict with the pieces and the estimated number of calls, tokens and cost.
+    """
+    labels = labels or [None] * len(texts)
+    tokens_saved = 0
+    if compact:
+        texts, tokens_saved = compact_texts(texts, labels)
+    max_piece_tokens = max(token_budget - prompt_tokens(), 1)
+    fan_out = budgeted_fan_out(fan_out, token_budget)
+
+    pieces = []
+    map_input_tokens = 0
+    for i, text in enumerate(texts):
+        for piece in split_text(text, max_piece_tokens):
+            pieces.append((i, piece))
+            map_input_tokens += count_tokens(piece) + prompt_tokens()
+
+    reduce_levels = []
+    remaining = len(pieces)
+    while remaining > 1:
+        remaining = math.ceil(remaining / fan_out)
+        reduce_levels.append(remaining)
+    reduce_calls = sum(reduce_levels)
+    reduce_input_tokens = reduce_calls * (fan_out * SUMMARY_EXPECTED_OUTPUT_TOKENS + prompt_tokens())
+
+    input_tokens = map_input_tokens + reduce_input_tokens
+    output_tokens = (len(pieces) + reduce_calls) * SUMMARY_EXPECTED_OUTPUT_TOKENS
+    estimated_cost = (input_tokens / 1000) * GPT4_INPUT_COST_PER_K + (output_tokens / 1000) * GPT4_OUTPUT_COST_PER_K
+    return {
+        "texts": list(texts),
+        "labels": list(labels),
+        "pieces": pieces,
+        "fan_out": fan_out,
+        "token_budget": token_budget,
+        "map_calls": len(pieces),
+        "reduce_calls": reduce_calls,
+        "reduce_levels": reduce_levels,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "estimated_cost": estimated_cost,
+        "tokens_saved": tokens_saved,
+    }
+
+def format_plan(plan: dict) -> str:
+    """
+    Returns a one-line description of a summarization plan.
+    """
+    return (
+        f"Summary plan: {plan['map_calls']} map + {plan['reduce_calls']} reduce calls "
+        f"(fan-out {plan['fan_out']}, {len(plan['reduce_levels'])} levels), "
+        f"~{plan['input_tokens']} input / ~{plan['output_tokens']} output tokens, "
+        f"~${plan['estimated_cost']:.4f}"
+        + (f" ({plan['tokens_saved']} tokens saved by compaction)" if plan["tokens_saved"] else "")
+    )
+
+def run_summarization_plan(plan: dict, max_workers: int = MAX_WORKERS, on_text_summarized=None, completed: dict = None) -> tuple[list, str, float]:
+    """
+    Executes a plan from plan_summarization, running every map and every reduce level concurrently.
+    `on_text_summarized(index, summary, cost)` is called from the calling thread once all pieces of a text are summarized.
+    `completed` maps text indices to summaries kept from a previous run; those texts are not summarized again.
+    Returns (text_summaries, final_summary, total_cost), text_summaries in the same order as the planned texts.
+    """
+    texts = plan["texts"]
+    labels = plan["labels"]
+    completed = completed or {}
+    if not plan["pieces"]:
+        return [""] * len(texts), "", 0.0
+    pieces = [(text_index, piece) for text_index, piece in plan["pieces"] if text_index not in completed]
+
+    remaining = [0] * len(texts)
+    text_costs = [0.0] * len(texts)
+    for text_index, _ in pieces:
+        remaining[text_index] += 1
+    piece_summaries = [None] * len(pieces)
+
+    def on_piece_done(i, result):
+        piece_summaries[i] = result[0]
+        text_index = pieces[i][0]
+        remaining[text_index] -= 1
+        text_costs[text_index] += result[1]
+        if remaining[text_index] == 0 and on_text_summarized:
+            on_text_summarized(text_index, _join_text_summary(text_index), text_costs[text_index])
+
+    def _join_text_summary(text_index):
+        return "\n\n".join(s for (t, _), s in zip(pieces, piece_summaries) if t == text_index)
+
+    if len(pieces) == 1 and not completed:
+        # The only summary is the final one
+        results = [stream_final_summary(pieces[0][1])]
+        on_piece_done(0, results[0])
+    else:
+        results = summarize_concurrently([piece for _, piece in pieces], max_workers, on_piece_done)
+    total_cost = sum(cost for _, cost in results)
+    text_summaries = [completed[i] if i in completed else _join_text_summary(i) for i in range(len(texts))]
+
+    # Reduce inputs keep the section title of the text each summary came from
+    summaries = []
+    for text_index in range(len(texts)):
+        if text_index in completed:
+            summaries.append((text_index, completed[text_index]))
+        else:
+            summaries += [(t, s) for (t, _), s in zip(pieces, piece_summaries) if t == text_index]
+    if len(summaries) == 1:
+        return text_summaries, summaries[0][1], total_cost
+    level = [f"## {labels[t]}\n\n{summary}" if labels[t] else summary for t, summary in summaries]
+    final_summary, reduce_cost = reduce_summaries(level, plan["fan_out"], max_workers)
+    return text_summaries, final_summary, total_cost + reduce_cost
+
+def summarize_text(text: str, token_budget: int = SUMMARY_TOKEN_BUDGET, label: str = None, compact: bool = COMPACT_TRANSCRIPTS) -> tuple[list, float]:
+    """
+    Map step for a single text that arrives on its own (e.g. a streamed chunk): compacts it (see compact_texts),
+    splits it to fit token_budget and summarizes the pieces in order.
+    Returns (piece_summaries, cost).
+    """
+    if compact:
+        text = compact_texts([text], [label])[0][0]
+    pieces = split_text(text, max(token_budget - prompt_tokens(), 1))
+    results = [generate_summary(piece) for piece in pieces]
+    return [summary for summary, _ in results], sum(cost for _, cost in results)
+
+def reduce_summaries(summaries: list, fan_out: int = None, max_workers: int = MAX_WORKERS) -> tuple[str, float]:
+    """
+    Reduces summaries in a tree where each call combines at most fan_out of them (budgeted_fan_out()
+    by default); every level runs concurrently, and the last call is streamed (see stream_final_summary).
+    Returns (final_summary, cost).
+    """
+    if not summaries:
+        return "", 0.0
+    fan_out = fan_out or budgeted_fan_out()
+    total_cost = 0.0
+    level = list(summaries)
+    while len(level) > 1:
+        groups = ["\n\n".join(level[i:i + fan_out]) for i in range(0, len(level), fan_out)]
+        if len(groups) == 1:
+            results = [stream_final_summary(groups[0])]
+        else:
+            results = summarize_concurrently(groups, max_workers)
+        total_cost += sum(cost for _, cost in results)
+        level = [summary for summary, _ in results]
+    return level[0], total_cost
+
+def stream_final_summary(text: str) -> tuple[str, float]:
+    """
+    Summarizes text as the final summary of a job, streaming it to notify_text as GPT-4o generates it,
+    so the CLI and the web app can show it before the call finishes.
+    Returns (summary, cost).
+    """
+    notify("Generating the final summary...")
+    stream = generate_summary_stream(text)
+    for delta in stream:
+        notify_text(delta)
+    return stream.text, stream.cost
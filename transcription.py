@@ -1,24 +1,103 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY
+import os
+from openai_client import call_openai
 from utils import get_audio_duration
 from config import WHISPER_COST_PER_MINUTE
+from cache import result_cache, hash_bytes, make_key
+from instrumentation import stage
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+WHISPER_MODEL = "whisper-1"
 
-def transcribe_audio(audio_file: str) -> tuple[str, float]:
+def _read_upload(audio_file) -> tuple[str, bytes]:
+    # Read once, so retries can send the same bytes again
+    if hasattr(audio_file, "read"):
+        audio_file.seek(0)
+        return os.path.basename(getattr(audio_file, "name", "audio.mp3")), audio_file.read()
+    with open(audio_file, "rb") as file:
+        return os.path.basename(audio_file), file.read()
+
+def _duration(audio_file, duration: float) -> float:
+    if duration is not None:
+        return duration
+    if hasattr(audio_file, "read"):
+        raise ValueError("The duration of in-memory audio must be given.")
+    return get_audio_duration(audio_file)
+
+def transcribe_audio(audio_file, duration: float = None) -> tuple[str, float]:
     """
-    Returns transcription text and processing cost
+    Returns transcription text and processing cost.
+    `audio_file` is a path or a file-like object holding the audio (e.g. a chunk from read_chunk), whose
+    name gives the format; `duration` in seconds, required for file-like objects, saves probing the file.
+    Results are cached by audio content and model; a cache hit costs nothing.
     """
-    duration = get_audio_duration(audio_file)
-    
-    with open(audio_file, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=file
+    upload = _read_upload(audio_file)
+    with stage("transcription", item=upload[0], model=WHISPER_MODEL) as event:
+        cache_key = make_key("transcription", WHISPER_MODEL, hash_bytes(upload[1]))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            event["cached"] = True
+            return cached["text"], 0.0
+
+        duration = _duration(audio_file, duration)
+
+        event["bytes"] = len(upload[1])
+        event["audio_seconds"] = duration
+        transcription = call_openai(
+            lambda client: client.audio.transcriptions.create(
+                model=WHISPER_MODEL,
+                file=upload
+            ),
+            model=WHISPER_MODEL,
+            audio_minutes=duration / 60
         )
-    
-    # Calculate cost
-    minutes = duration / 60
-    cost = minutes * WHISPER_COST_PER_MINUTE
-    
-    return transcription.text, cost
\ No newline at end of file
+
+        # Calculate cost
+        minutes = duration / 60
+        cost = minutes * WHISPER_COST_PER_MINUTE
+        event["cost"] = cost
+
+        result_cache.put(cache_key, {"text": transcription.text, "cost": cost})
+        return transcription.text, cost
+
+def transcribe_audio_segments(audio_file, duration: float = None) -> tuple[list, float]:
+    """
+    Transcribes the audio with segment-level timestamps (Whisper's verbose_json format).
+    `audio_file` and `duration` are as in transcribe_audio.
+    Returns (segments, cost), where each segment is a dict with "start", "end" (seconds,
+    relative to the start of audio_file) and "text".
+    Results are cached by audio content and model; a cache hit costs nothing.
+    """
+    upload = _read_upload(audio_file)
+    with stage("transcription", item=upload[0], model=WHISPER_MODEL, timestamps=True) as event:
+        cache_key = make_key("transcription_segments", WHISPER_MODEL, hash_bytes(upload[1]))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            event["cached"] = True
+            return cached["segments"], 0.0
+
+        duration = _duration(audio_file, duration)
+
+        event["bytes"] = len(upload[1])
+        event["audio_seconds"] = duration
+        transcription = call_openai(
+            lambda client: client.audio.transcriptions.create(
+                model=WHISPER_MODEL,
+                file=upload,
+                response_format="verbose_json",
+                timestamp_granularities=["segment"]
+            ),
+            model=WHISPER_MODEL,
+            audio_minutes=duration / 60
+        )
+
+        segments = [
+            {"start": float(segment.start), "end": float(segment.end), "text": segment.text.strip()}
+            for segment in (transcription.segments or [])
+        ]
+
+        # Calculate cost
+        minutes = duration / 60
+        cost = minutes * WHISPER_COST_PER_MINUTE
+        event["cost"] = cost
+
+        result_cache.put(cache_key, {"segments": segments, "cost": cost})
+        return segments, cost
@@ -1,5 +1,5 @@
 import re
-import ffmpeg
+import media_info
 
 def clean_filename(s: str) -> str:
     """
@@ -18,11 +18,6 @@ def save_markdown(filename: str, content: str):
 
 def get_audio_duration(audio_path: str) -> float:
     """
-    Returns the duration of the audio file in seconds.
+    Returns the duration of the audio file in seconds (probed once per file, see media_info).
     """
-    try:
-        probe = ffmpeg.probe(audio_path)
-        return float(probe['format']['duration'])
-    except Exception as e:
-        print(f"Error getting duration: {e}")
-        return 0.0
\ No newline at end of file
+    return media_info.get_duration(audio_path)
\ No newline at end of file
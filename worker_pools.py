@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Process-wide limits shared by every job. Unset limits mean "no limit", which is
+# what a single CLI or Streamlit run wants; batch runs configure all three.
+_download_slots = None
+_ffmpeg_slots = None
+_api_executor = None
+_lock = threading.Lock()
+
+def configure_pools(download_workers: int = None, ffmpeg_workers: int = None, api_workers: int = None):
+    """
+    Bounds the number of concurrent downloads, ffmpeg processes and API calls across all jobs
+    of this process. API calls run on one shared thread pool so it stays busy across jobs.
+    """
+    global _download_slots, _ffmpeg_slots, _api_executor
+    with _lock:
+        _download_slots = threading.BoundedSemaphore(download_workers) if download_workers else None
+        _ffmpeg_slots = threading.BoundedSemaphore(ffmpeg_workers) if ffmpeg_workers else None
+        if _api_executor is not None:
+            _api_executor.shutdown(wait=False)
+        _api_executor = ThreadPoolExecutor(max_workers=api_workers, thread_name_prefix="api") if api_workers else None
+
+def shutdown_pools():
+    """
+    Removes every limit and stops the shared API pool.
+    """
+    configure_pools()
+
+@contextmanager
+def _slot(semaphore):
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
+def download_slot():
+    """
+    Context manager held while a download runs.
+    """
+    return _slot(_download_slots)
+
+def ffmpeg_slot():
+    """
+    Context manager held while an ffmpeg process runs.
+    """
+    return _slot(_ffmpeg_slots)
+
+def get_api_executor():
+    """
+    Returns the shared API thread pool, or None when each caller should use its own.
+    """
+    return _api_executor
@@ -1,14 +1,45 @@
 import re
-import yt_dlp
 
-def get_video_description(url: str) -> str:
+def extract_video_metadata(info: dict) -> dict:
     """
-    Fetches the video description from YouTube using yt_dlp.
+    Keeps the fields the pipeline needs from a yt_dlp info dict, so a single extraction
+    serves the download, the output names and the partitioning.
+    Returns a dict with "title", "description", "duration" and "chapters".
     """
-    ydl_opts = {'quiet': True, 'skip_download': True}
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        return info.get("description", "")
+    return {
+        "title": info.get("title") or "output",
+        "description": info.get("description") or "",
+        "duration": float(info.get("duration") or 0.0),
+        "chapters": info.get("chapters") or [],
+    }
+
+def clean_label(label: str) -> str:
+    """
+    Cleans a section title so it can be used in file names.
+    """
+    return re.sub(r'[^a-zA-Z0-9_]', '', label.strip().replace(" ", "_"))
+
+def extract_timestamps_from_chapters(chapters: list) -> list:
+    """
+    Converts yt_dlp's structured chapters ({"start_time", "title", ...}) into timestamps.
+    Returns a list of tuples (timestamp_in_seconds, label).
+    """
+    timestamps = []
+    for chapter in chapters:
+        if chapter.get("start_time") is None:
+            continue
+        timestamps.append((int(chapter["start_time"]), clean_label(chapter.get("title") or "")))
+    return sorted(timestamps)
+
+def get_video_timestamps(metadata: dict) -> list:
+    """
+    Returns the video's sections as a list of tuples (timestamp_in_seconds, label), using YouTube's
+    structured chapters when present and falling back to parsing the description.
+    """
+    timestamps = extract_timestamps_from_chapters(metadata.get("chapters") or [])
+    if timestamps:
+        return timestamps
+    return extract_timestamps_from_description(metadata.get("description") or "")
 
 def extract_timestamps_from_description(description: str) -> list:
     """
@@ -28,6 +59,5 @@ def extract_timestamps_from_description(description: str) -> list:
         else:
             continue
         # Clean label for filenames
-        clean_label = re.sub(r'[^a-zA-Z0-9_]', '', label.strip().replace(" ", "_"))
-        timestamps.append((seconds, clean_label))
+        timestamps.append((seconds, clean_label(label)))
     return timestamps